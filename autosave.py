@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import time
+
+class EditJournal:
+    """Append-only log of note edits that are not committed to the database yet.
+
+    Each line is one JSON record {"note_id", "fields", "time"}. Records are
+    fsynced when the edit is submitted, so edits survive a crash before the
+    database write is durable and are replayed on the next start.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(
+            os.path.expanduser("~"), ".note_typewriter", "journal.jsonl")
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+    def append(self, edits):
+        """Durably record edits, a dict of note_id -> changed fields."""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for note_id, fields in edits.items():
+                record = {'note_id': note_id, 'fields': fields, 'time': time.time()}
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def pending(self):
+        """Edits recorded in the journal, later records win per field."""
+        edits = {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break  # Torn write of the last record during a crash
+                    edits.setdefault(record['note_id'], {}).update(record['fields'])
+        except FileNotFoundError:
+            pass
+        return edits
+
+    def clear(self):
+        with open(self.path, 'w', encoding='utf-8'):
+            pass
+
+class WriteBehindQueue:
+    """Commits note edits to the database on a background thread.
+
+    submit() returns immediately. Edits to the same note that arrive before
+    the thread gets to them are merged, so a burst of changes costs a
+    single write. Edits are journaled as they are submitted. The thread
+    commits them and empties the journal once nothing is left to write and
+    a checkpoint has made the commits durable.
+    """
+
+    def __init__(self, db, journal=None, on_saved=None):
+        self.db = db
+        self.journal = journal or EditJournal()
+        self.on_saved = on_saved
+        self._pending = {}
+        self._in_flight = {}
+        self._condition = threading.Condition()
+        self._stopping = False
+        # After a failed write the journal is kept until the next start
+        self._failed = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def replay(self):
+        """Apply edits left in the journal by a previous run, return their note ids."""
+        edits = self.journal.pending()
+        for note_id, fields in edits.items():
+            # Rendered HTML is no longer stored, older journals may have it
+            fields.pop('html_content', None)
+            self.db.update_note(note_id, **fields)
+        self.journal.clear()
+        return list(edits)
+
+    def submit(self, note_id, **fields):
+        with self._condition:
+            # Under the lock, so the journal is never cleared between the
+            # append and the edit being queued
+            self.journal.append({note_id: fields})
+            self._pending.setdefault(note_id, {}).update(fields)
+            self._condition.notify()
+
+    def pending_fields(self, note_id):
+        """Fields of note_id that are queued or being written right now."""
+        with self._condition:
+            fields = dict(self._in_flight.get(note_id, {}))
+            fields.update(self._pending.get(note_id, {}))
+        return fields
+
+    def flush(self):
+        """Block until every submitted edit is committed."""
+        with self._condition:
+            while self._pending or self._in_flight:
+                self._condition.wait()
+
+    def stop(self):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    break
+                batch, self._pending = self._pending, {}
+                self._in_flight = batch
+
+            saved = durable = False
+            try:
+                for note_id, fields in batch.items():
+                    self.db.update_note(note_id, **fields)
+                saved = True
+                durable = self.db.checkpoint()
+            except Exception as e:
+                # The journal still has the edits, they are replayed on next start
+                self._failed = True
+                print(f"Error saving notes: {e}")
+
+            with self._condition:
+                self._in_flight = {}
+                # Otherwise the journal is cleared after a later batch or replayed
+                if durable and not self._failed and not self._pending:
+                    self.journal.clear()
+                self._condition.notify_all()
+
+            if saved and self.on_saved:
+                for note_id in batch:
+                    self.on_saved(note_id)
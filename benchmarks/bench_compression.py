@@ -0,0 +1,71 @@
+"""Compare database size and note throughput with and without compression.
+
+Usage: python benchmarks/bench_compression.py [--notes N]
+
+The corpus is text taken from standard library source files. Each codec
+gets a fresh database that is vacuumed before its size is measured.
+"""
+import argparse
+import os
+import sys
+import sysconfig
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+def load_corpus(notes):
+    stdlib = sysconfig.get_paths()['stdlib']
+    corpus = []
+    for name in sorted(os.listdir(stdlib)):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(stdlib, name), encoding='utf-8', errors='replace') as f:
+            content = f.read()
+        corpus.append((name, content))
+        if len(corpus) == notes:
+            break
+    return corpus
+
+def run_codec(codec, corpus):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        db = Database(db_file=path, compression=codec)
+
+        start = time.perf_counter()
+        ids = [
+            db.create_note(title, content=content).id
+            for title, content in corpus
+        ]
+        write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for note_id in ids:
+            db.get_note(note_id).content
+        read = time.perf_counter() - start
+
+        db.close()
+        db = Database(db_file=path, pragmas={})
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        db.close()
+        size = os.path.getsize(path)
+
+    print(f"{codec or 'none':<6} size {size / 1024 / 1024:7.2f} MiB   "
+          f"write {len(corpus) / write:7.0f}/s   open {len(corpus) / read:7.0f}/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=500)
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.notes)
+    text_bytes = sum(len(content) for _, content in corpus)
+    print(f"{len(corpus)} notes, {text_bytes / 1024 / 1024:.2f} MiB of content")
+    for codec in (None, 'zlib', 'lzma'):
+        run_codec(codec, corpus)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Measure editor latency per keystroke in a large rich-text document.
+
+Usage: python benchmarks/bench_keystrokes.py [--paragraphs N] [--keys N]
+
+Opens the main window offscreen with a document of mixed bold, italic,
+centered and list paragraphs, then types into it while moving between
+paragraphs with different formats, as when editing. Each keystroke is
+timed from the key press until the event queue is empty. textChanged
+signals are counted to show edits that formatting code fed back into the
+document.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PySide6.QtCore import Qt
+from PySide6.QtTest import QTest
+from PySide6.QtWidgets import QApplication
+
+from ui.main_window import MainWindow
+
+def make_html(paragraphs):
+    parts = []
+    for index in range(paragraphs):
+        text = f"Paragraph {index} with enough words to wrap across the editor width when shown."
+        kind = index % 5
+        if kind == 0:
+            parts.append(f"<p><b>{text}</b></p>")
+        elif kind == 1:
+            parts.append(f'<p align="center"><i>{text}</i></p>')
+        elif kind == 2:
+            parts.append(f"<ul><li>{text}</li></ul>")
+        elif kind == 3:
+            parts.append(f'<p><span style="font-size:16pt">{text}</span></p>')
+        else:
+            parts.append(f"<p>{text}</p>")
+    return "\n".join(parts)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--keys", type=int, default=400)
+    args = parser.parse_args()
+
+    app = QApplication([])
+    window = MainWindow()
+    window.resize(1200, 800)
+    window.show()
+    editor = window.editor
+    editor.setHtml(make_html(args.paragraphs))
+    editor.setFocus()
+    app.processEvents()
+
+    changes = [0]
+    editor.textChanged.connect(lambda: changes.__setitem__(0, changes[0] + 1))
+    cursor = editor.textCursor()
+    cursor.setPosition(editor.document().findBlockByNumber(args.paragraphs // 2).position())
+    editor.setTextCursor(cursor)
+
+    latencies = []
+    for key in range(args.keys):
+        if key % 20 == 19:
+            # Next paragraph, which has a different format
+            QTest.keyClick(editor, Qt.Key_Down)
+            app.processEvents()
+        start = time.perf_counter()
+        QTest.keyClick(editor, "x")
+        app.processEvents()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{args.keys} keystrokes, {editor.document().blockCount()} blocks")
+    print(f"median {statistics.median(latencies):6.2f} ms   p95 {p95:6.2f} ms   max {latencies[-1]:6.2f} ms")
+    print(f"textChanged per keystroke {changes[0] / args.keys:.2f}")
+    window.preview.stop_rendering()
+
+if __name__ == '__main__':
+    main()
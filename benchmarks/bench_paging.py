@@ -0,0 +1,63 @@
+"""Compare offset and keyset pagination of the note list on a large library.
+
+Usage: python benchmarks/bench_paging.py [--notes N] [--page N]
+
+Times fetching one page at increasing depths, once with offset and once
+with after (the last summary of the previous page), and the peak Python
+memory of listing every summary at once versus iter_note_summaries().
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+def timed(run, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def peak_memory(run):
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024 / 1024
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--page", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_file=os.path.join(tmp, "bench.db"))
+        start = datetime(2020, 1, 1)
+        for first in range(0, args.notes, 5000):
+            db.insert_notes([{
+                'title': f"note {index}",
+                'updated_at': start + timedelta(minutes=index),
+            } for index in range(first, min(first + 5000, args.notes))])
+
+        summaries = db.get_note_summaries()
+        for depth in (0, args.notes // 10, args.notes // 2, args.notes - args.page):
+            after = summaries[depth - 1] if depth else None
+            offset_ms = timed(lambda: db.get_note_summaries(offset=depth, limit=args.page))
+            keyset_ms = timed(lambda: db.get_note_summaries(after=after, limit=args.page))
+            print(f"page at row {depth:>7}   offset {offset_ms:7.2f} ms   after {keyset_ms:7.2f} ms")
+        del summaries
+
+        listed = peak_memory(lambda: db.get_note_summaries())
+        streamed = peak_memory(lambda: sum(1 for _ in db.iter_note_summaries()))
+        print(f"peak memory   list {listed:6.1f} MiB   iter_note_summaries {streamed:6.1f} MiB")
+        db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Compare note throughput with SQLite's defaults and DEFAULT_PRAGMAS.
+
+Usage: python benchmarks/bench_sqlite_profile.py [--notes N] [--searches N]
+
+Each profile gets a fresh database in a temporary directory. Timings cover
+create_note and update_note (one commit each, as in the app) and
+search_note_summaries.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, DEFAULT_PRAGMAS
+
+WORDS = ("note meeting idea project draft review python sqlite search index "
+         "budget travel recipe garden music reading workout family email").split()
+
+def make_text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def run_profile(name, pragmas, notes, searches):
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_file=os.path.join(tmp, "bench.db"), pragmas=pragmas)
+
+        start = time.perf_counter()
+        ids = [
+            db.create_note(make_text(rng, 4), content=make_text(rng, 300), tags=make_text(rng, 2)).id
+            for _ in range(notes)
+        ]
+        create = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for note_id in ids:
+            db.update_note(note_id, content=make_text(rng, 300))
+        update = time.perf_counter() - start
+
+        queries = [rng.choice(WORDS)[:4] for _ in range(searches)]
+        start = time.perf_counter()
+        for query in queries:
+            db.search_note_summaries(query, limit=200)
+        search = time.perf_counter() - start
+
+        db.close()
+
+    print(f"{name:<10} create {notes / create:9.0f}/s   update {notes / update:9.0f}/s   "
+          f"search {searches / search:7.0f}/s")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--searches", type=int, default=200)
+    args = parser.parse_args()
+
+    run_profile("default", {}, args.notes, args.searches)
+    run_profile("tuned", DEFAULT_PRAGMAS, args.notes, args.searches)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Measure GUI startup: time to first paint and the imports it waits for.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--max-first-paint-ms MS]
+
+Each run starts a fresh interpreter with -X importtime that goes through
+main.start() against a throwaway home directory. The report lists the
+median time to first paint and to a usable window, and the slowest
+imports done before the first paint. Exits with status 1 when the median
+first paint is over the threshold, so it can guard against regressions.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports finished before this line was written happened before the first paint
+PAINT_MARKER = "first-paint"
+
+CHILD = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from PySide6.QtCore import QObject, QEvent, QTimer
+from PySide6.QtWidgets import QApplication
+import main
+
+class PaintWatcher(QObject):
+    painted = None
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and self.painted is None:
+            self.painted = time.perf_counter() - start
+            print({marker!r}, file=sys.stderr, flush=True)
+        return False
+
+app = QApplication([])
+watcher = PaintWatcher()
+app.installEventFilter(watcher)
+note_app = main.start(app)
+ready = time.perf_counter() - start
+QTimer.singleShot(0, app.quit)
+app.exec()
+print(watcher.painted, ready)
+"""
+
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)')
+
+def run_once(home):
+    env = dict(os.environ, HOME=home, QT_QPA_PLATFORM=os.environ.get('QT_QPA_PLATFORM', 'offscreen'))
+    child = CHILD.format(root=ROOT, marker=PAINT_MARKER)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", child],
+                            capture_output=True, text=True, env=env, check=True)
+    painted, ready = (float(value) for value in result.stdout.split()[-2:])
+
+    # Top-level imports (cumulative time) finished before the first paint
+    imports = {}
+    for line in result.stderr.splitlines():
+        if line.strip() == PAINT_MARKER:
+            break
+        match = IMPORT_LINE.match(line)
+        if match and len(match.group(3)) == 1:
+            imports[match.group(4)] = int(match.group(2)) / 1000
+    return painted, ready, imports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-first-paint-ms", type=float, default=800)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    painted, ready, imports = [], [], {}
+    with tempfile.TemporaryDirectory() as home:
+        for _ in range(args.runs):
+            run_painted, run_ready, run_imports = run_once(home)
+            painted.append(run_painted * 1000)
+            ready.append(run_ready * 1000)
+            for name, ms in run_imports.items():
+                imports.setdefault(name, []).append(ms)
+
+    first_paint = statistics.median(painted)
+    print(f"first paint {first_paint:7.0f} ms   ready {statistics.median(ready):7.0f} ms")
+    print("slowest imports before first paint:")
+    slowest = sorted(imports.items(), key=lambda item: -statistics.median(item[1]))
+    for name, times in slowest[:args.top]:
+        print(f"  {statistics.median(times):7.1f} ms  {name}")
+
+    if first_paint > args.max_first_paint_ms:
+        print(f"first paint over the {args.max_first_paint_ms:.0f} ms budget")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
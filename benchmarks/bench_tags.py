@@ -0,0 +1,83 @@
+"""Time tag filters on a large library against a substring match on Note.tags.
+
+Usage: python benchmarks/bench_tags.py [--notes N] [--tags N] [--queries N]
+
+Notes are bulk inserted into a fresh database with one to four tags each,
+drawn so that a few tags are common and most are rare. Each filter is
+timed for the first page of results (50 rows), as the note list loads it.
+The migration line times splitting the tags strings of every note, as
+done once when opening a database created before the note_tags table.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, Note, NoteTag, SUMMARY_COLUMNS
+
+PAGE = 50
+
+def timed(queries, run):
+    start = time.perf_counter()
+    for query in queries:
+        run(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--notes", type=int, default=100000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    names = [f"tag{index}" for index in range(args.tags)]
+    weights = [1 / (rank + 1) for rank in range(args.tags)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(db_file=os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        for first in range(0, args.notes, 5000):
+            db.insert_notes([{
+                'title': f"note {index}",
+                'content': "",
+                'tags': ", ".join(set(rng.choices(names, weights, k=rng.randint(1, 4)))),
+            } for index in range(first, min(first + 5000, args.notes))])
+        print(f"inserted {args.notes} notes in {time.perf_counter() - start:.1f} s")
+
+        with db.engine.begin() as conn:
+            conn.execute(NoteTag.__table__.delete())
+        start = time.perf_counter()
+        db.index_existing_tags()
+        print(f"migration          {(time.perf_counter() - start) * 1000:8.0f} ms")
+
+        common = names[:5]
+        rare = names[-100:]
+        pairs = [rng.sample(names[:50], 2) for _ in range(args.queries)]
+        queries = {
+            'common tag': [[rng.choice(common)] for _ in range(args.queries)],
+            'rare tag': [[rng.choice(rare)] for _ in range(args.queries)],
+            'all of two tags': pairs,
+        }
+        for label, tag_lists in queries.items():
+            ms = timed(tag_lists, lambda tags: db.get_note_summaries(tags=tags, limit=PAGE))
+            print(f"{label:<18} {ms:8.2f} ms")
+        ms = timed(pairs, lambda tags: db.get_note_summaries(tags=tags, match_all=False, limit=PAGE))
+        print(f"{'any of two tags':<18} {ms:8.2f} ms")
+        ms = timed(range(5), lambda _: db.get_tag_counts())
+        print(f"{'tag counts':<18} {ms:8.2f} ms")
+
+        def substring(tags):
+            with db.read_session() as session:
+                session.query(*SUMMARY_COLUMNS).filter(Note.tags.ilike(f"%{tags[0]}%")).order_by(
+                    Note.updated_at.desc()).limit(PAGE).all()
+        ms = timed([[rng.choice(rare)] for _ in range(args.queries)], substring)
+        print(f"{'ilike, rare tag':<18} {ms:8.2f} ms")
+        db.close()
+
+if __name__ == '__main__':
+    main()
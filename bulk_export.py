@@ -0,0 +1,270 @@
+"""Export every note to a directory tree, a zip file or a JSONL archive.
+
+Usage: python bulk_export.py OUTPUT [--db FILE] [--format markdown|html|both]
+                             [--category NAME] [--incremental] [--workers N]
+
+OUTPUT ending in .zip or .jsonl selects that format, anything else is a
+directory. Notes are streamed from the database in chunks and Markdown is
+rendered to HTML in a process pool. With --incremental, notes whose
+updated_at matches the manifest of the previous run are not rendered or
+written again.
+"""
+import argparse
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import re
+import shutil
+import sys
+import zipfile
+
+from bulk_import import CHUNK_SIZE, CHUNKS_IN_FLIGHT, chunks
+from database import Database, NoteCategory
+from renderer import create_markdown
+
+MANIFEST_NAME = ".manifest.json"
+
+ExportReport = namedtuple('ExportReport', 'exported unchanged removed')
+
+_md = None
+
+def _render_chunk(contents):
+    """Runs in a worker process, one Markdown instance per process."""
+    global _md
+    if _md is None:
+        _md = create_markdown()
+    htmls = []
+    for content in contents:
+        _md.reset()
+        htmls.append(_md.convert(content))
+    return htmls
+
+def note_basename(note):
+    slug = re.sub(r'[^\w]+', '-', note.title.lower()).strip('-')[:60] or 'note'
+    category = note.category.value if note.category else NoteCategory.ALL.value
+    return f"{category}/{slug}-{note.id}"
+
+def note_files(note, content, html, formats):
+    """(path, text) pairs of a note, same layout as the single-note export."""
+    base = note_basename(note)
+    files = []
+    if 'markdown' in formats:
+        files.append((base + ".md", f"# {note.title}\n\n{content}"))
+    if html is not None:
+        files.append((base + ".html", f"<h1>{note.title}</h1>\n{html}"))
+    return files
+
+def note_record(note, content, html):
+    metadata = note.to_dict()
+    del metadata['content']
+    record = {'title': note.title, 'content': content, 'metadata': metadata}
+    if html is not None:
+        record['html'] = html
+    return json.dumps(record, default=str, ensure_ascii=False) + "\n"
+
+class DirectoryOutput:
+    def __init__(self, path, formats, previous):
+        self.path = path
+        self.formats = formats
+        self.previous = previous
+        os.makedirs(path, exist_ok=True)
+
+    def keep(self, note, entry):
+        # Files deleted by hand since the last export are written again
+        if all(os.path.exists(os.path.join(self.path, name)) for name in entry['paths']):
+            return entry
+        return None
+
+    def write(self, note, content, html):
+        paths = []
+        for name, text in note_files(note, content, html, self.formats):
+            file_path = os.path.join(self.path, name)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(file_path + '.tmp', file_path)
+            paths.append(name)
+        return {'paths': paths}
+
+    def finish(self, manifest):
+        """Remove files of notes that were deleted or renamed, return how many."""
+        current = {name for entry in manifest.values() for name in entry['paths']}
+        removed = 0
+        for entry in self.previous.values():
+            for name in entry.get('paths', ()):
+                if name not in current:
+                    try:
+                        os.remove(os.path.join(self.path, name))
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+        return removed
+
+class ZipOutput:
+    def __init__(self, path, formats, previous):
+        self.path = path
+        self.formats = formats
+        # Unchanged notes are copied over from the previous archive. zipfile
+        # has no raw copy, so they are inflated and deflated again, which
+        # still skips reading and rendering the note.
+        self.old = zipfile.ZipFile(path) if previous and os.path.exists(path) else None
+        self.zip = zipfile.ZipFile(path + '.tmp', 'w', zipfile.ZIP_DEFLATED)
+
+    def keep(self, note, entry):
+        if self.old is None:
+            return None
+        for name in entry['paths']:
+            with self.old.open(name) as src, self.zip.open(name, 'w') as dst:
+                shutil.copyfileobj(src, dst)
+        return entry
+
+    def write(self, note, content, html):
+        files = note_files(note, content, html, self.formats)
+        for name, text in files:
+            self.zip.writestr(name, text)
+        return {'paths': [name for name, _ in files]}
+
+    def finish(self, manifest):
+        self.zip.close()
+        if self.old is not None:
+            self.old.close()
+        os.replace(self.path + '.tmp', self.path)
+        return 0
+
+class JsonlOutput:
+    def __init__(self, path, formats, previous):
+        self.path = path
+        self.old = open(path, 'rb') if previous and os.path.exists(path) else None
+        self.file = open(path + '.tmp', 'wb')
+
+    def _append(self, data):
+        entry = {'offset': self.file.tell(), 'length': len(data)}
+        self.file.write(data)
+        return entry
+
+    def keep(self, note, entry):
+        if self.old is None:
+            return None
+        self.old.seek(entry['offset'])
+        return self._append(self.old.read(entry['length']))
+
+    def write(self, note, content, html):
+        return self._append(note_record(note, content, html).encode('utf-8'))
+
+    def finish(self, manifest):
+        self.file.close()
+        if self.old is not None:
+            self.old.close()
+        os.replace(self.path + '.tmp', self.path)
+        return 0
+
+def open_output(path, formats, previous):
+    if path.endswith('.zip'):
+        return ZipOutput(path, formats, previous)
+    if path.endswith('.jsonl'):
+        return JsonlOutput(path, formats, previous)
+    return DirectoryOutput(path, formats, previous)
+
+def manifest_path(path):
+    if path.endswith(('.zip', '.jsonl')):
+        return path + MANIFEST_NAME
+    return os.path.join(path, MANIFEST_NAME)
+
+def load_manifest(path, settings):
+    """Entries of the previous export to path, empty if it used other settings."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('settings') != settings:
+        return {}
+    return manifest.get('notes', {})
+
+def export_notes(db, path, formats=('markdown',), category=None, incremental=False,
+                 workers=None, progress=None):
+    """Export the notes of category (all by default) to path.
+
+    formats is any of 'markdown' and 'html'. progress(exported, unchanged)
+    is called after each chunk. Returns an ExportReport.
+    """
+    formats = [name for name in ('markdown', 'html') if name in formats]
+    settings = {'formats': formats, 'category': category.value if category else None}
+    previous = load_manifest(manifest_path(path), settings) if incremental else {}
+    output = open_output(path, formats, previous)
+    render = 'html' in formats
+    manifest = {}
+    exported = unchanged = 0
+
+    def write(notes, contents, htmls):
+        nonlocal exported
+        for note, content, html in zip(notes, contents, htmls):
+            entry = output.write(note, content, html)
+            manifest[str(note.id)] = dict(entry, updated_at=note.updated_at.isoformat())
+            exported += 1
+        if progress:
+            progress(exported, unchanged)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for chunk in chunks(db.iter_notes(category=category), CHUNK_SIZE):
+            changed = []
+            for note in chunk:
+                stamp = note.updated_at.isoformat()
+                entry = previous.get(str(note.id))
+                if entry and entry['updated_at'] == stamp:
+                    kept = output.keep(note, entry)
+                    if kept is not None:
+                        manifest[str(note.id)] = dict(kept, updated_at=stamp)
+                        unchanged += 1
+                        continue
+                changed.append(note)
+            if not changed:
+                continue
+            # Exported files must not depend on the attachments table
+            contents = [db.resolve_attachments(note.content or "") for note in changed]
+            if render:
+                in_flight.append((changed, contents, pool.submit(_render_chunk, contents)))
+                if len(in_flight) >= CHUNKS_IN_FLIGHT:
+                    notes, contents, future = in_flight.popleft()
+                    write(notes, contents, future.result())
+            else:
+                write(changed, contents, [None] * len(changed))
+        while in_flight:
+            notes, contents, future = in_flight.popleft()
+            write(notes, contents, future.result())
+
+    removed = output.finish(manifest)
+    target = manifest_path(path)
+    with open(target + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'notes': manifest}, f)
+    os.replace(target + '.tmp', target)
+    return ExportReport(exported, unchanged, removed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="directory, .zip or .jsonl file")
+    parser.add_argument("--db", help="database file (default: the app's)")
+    parser.add_argument("--format", choices=("markdown", "html", "both"), default="markdown")
+    parser.add_argument("--category", help="only export this category")
+    parser.add_argument("--incremental", action="store_true",
+                        help="skip notes unchanged since the last export to OUTPUT")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    formats = ("markdown", "html") if args.format == "both" else (args.format,)
+    category = NoteCategory(args.category) if args.category else None
+
+    def report(exported, unchanged):
+        print(f"\rExported {exported} notes, {unchanged} unchanged", end="", file=sys.stderr)
+
+    db = Database(db_file=args.db, compression="zlib")
+    result = export_notes(db, args.output, formats, category, args.incremental,
+                          args.workers, progress=report)
+    print(f"\rExported {result.exported} notes, {result.unchanged} unchanged, "
+          f"{result.removed} removed", file=sys.stderr)
+    db.close()
+
+if __name__ == '__main__':
+    main()
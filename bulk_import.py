@@ -0,0 +1,261 @@
+"""Import many notes at once from a Markdown directory tree or a JSONL archive.
+
+Usage: python bulk_import.py SOURCE [--db FILE] [--batch-size N] [--workers N]
+
+Files are parsed in a process pool and inserted in batched transactions
+through Database.insert_notes(). A file that fails to parse is reported
+and skipped, the rest of the run continues.
+"""
+import argparse
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import json
+import os
+import re
+import sys
+
+from database import Database, NoteCategory
+
+MARKDOWN_EXTENSIONS = ('.md', '.markdown', '.mdown', '.txt')
+# Files, archive lines or notes (for bulk_export) handed to a worker
+# process at a time
+CHUNK_SIZE = 64
+# Chunks processed ahead of the writes, bounds memory use
+CHUNKS_IN_FLIGHT = 16
+
+ImportReport = namedtuple('ImportReport', 'imported errors')
+
+_FRONT_MATTER = re.compile(r'\A---[ \t]*\r?\n(.*?)\r?\n(?:---|\.\.\.)[ \t]*(?:\r?\n|\Z)', re.S)
+_HEADING = re.compile(r'^#[ \t]+(.+?)[ \t#]*$', re.M)
+_DATE_FIELDS = {'created': 'created_at', 'created_at': 'created_at', 'date': 'created_at',
+                'updated': 'updated_at', 'updated_at': 'updated_at', 'modified': 'updated_at'}
+
+def _scalar(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    return value
+
+def parse_front_matter(text):
+    """Split a YAML front-matter block off text, return (fields, body).
+
+    Only the subset notes use is understood: "key: value" lines, inline
+    lists ("[a, b]") and block lists ("- a" lines under a key).
+    """
+    match = _FRONT_MATTER.match(text)
+    if not match:
+        return {}, text
+
+    fields = {}
+    key = None
+    for line in match.group(1).splitlines():
+        if not line.strip() or line.lstrip().startswith('#'):
+            continue
+        stripped = line.strip()
+        if stripped.startswith('- ') and key is not None:
+            if not isinstance(fields[key], list):
+                fields[key] = []
+            fields[key].append(_scalar(stripped[2:]))
+            continue
+        key, sep, value = line.partition(':')
+        if not sep:
+            raise ValueError(f"invalid front-matter line: {line!r}")
+        key = key.strip().lower()
+        value = value.strip()
+        if value.startswith('[') and value.endswith(']'):
+            fields[key] = [_scalar(item) for item in value[1:-1].split(',') if item.strip()]
+        else:
+            fields[key] = _scalar(value)
+    return fields, text[match.end():]
+
+def parse_category(value):
+    if isinstance(value, list):
+        value = value[0] if value else None
+    for category in NoteCategory:
+        if value and value.lower() in (category.value.lower(), category.name.lower()):
+            return category
+    return NoteCategory.ALL
+
+def parse_tags(value):
+    if isinstance(value, list):
+        tags = value
+    else:
+        tags = (value or "").split(',')
+    return ", ".join(tag.strip().lstrip('#') for tag in tags if tag.strip())
+
+def parse_date(value):
+    """Naive UTC datetime of an ISO 8601 value, ValueError if it is not one."""
+    if not value or isinstance(value, list):
+        return None
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    # Stored as naive UTC, like datetime.utcnow() defaults
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def note_from_fields(fields, content, default_title):
+    """Note dict for Database.insert_notes() from front-matter style fields."""
+    fields = dict(fields)
+    title = fields.pop('title', None)
+    if not title:
+        heading = _HEADING.search(content)
+        title = heading.group(1) if heading else default_title
+    note = {
+        'title': str(title)[:200],
+        'content': content,
+        'category': parse_category(fields.pop('category', None)),
+        'tags': parse_tags(fields.pop('tags', None)),
+        'created_at': None,
+        'updated_at': None,
+    }
+    for name, column in _DATE_FIELDS.items():
+        if name in fields:
+            value = fields.pop(name)
+            try:
+                note[column] = parse_date(value)
+            except ValueError:
+                # Such as "Jan 5 2021" or a template placeholder, the note is
+                # imported with the value kept in its metadata
+                fields[name] = value
+    note['metadata'] = fields
+    return note
+
+def parse_markdown_file(path, root):
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    fields, body = parse_front_matter(text)
+    fields.setdefault('source', os.path.relpath(path, root))
+    return note_from_fields(fields, body, os.path.splitext(os.path.basename(path))[0])
+
+def parse_json_record(line):
+    """Note dict from one archive line, as written by export_note() or a flat record."""
+    record = json.loads(line)
+    fields = dict(record.get('metadata') or {})
+    # The export metadata repeats the note's own columns
+    for name in ('id', 'content', 'html_content'):
+        fields.pop(name, None)
+    # html is the rendered content written by bulk_export, not metadata
+    for name, value in record.items():
+        if name not in ('content', 'html', 'metadata'):
+            fields[name] = value
+    # Nested user metadata of an exported note becomes the note's metadata
+    extra = fields.pop('metadata', None)
+    if isinstance(extra, dict):
+        fields.update(extra)
+    return note_from_fields(fields, record.get('content') or "", 'Imported Note')
+
+def _parse_chunk(kind, items, root):
+    """Runs in a worker process. Returns (source, note or None, error or None) per item."""
+    results = []
+    for source, item in items:
+        try:
+            if kind == 'markdown':
+                note = parse_markdown_file(item, root)
+            else:
+                note = parse_json_record(item)
+            results.append((source, note, None))
+        except Exception as e:
+            results.append((source, None, f"{type(e).__name__}: {e}"))
+    return results
+
+def iter_sources(path):
+    """Yield (source, item) pairs: Markdown file paths, or JSONL lines of an archive."""
+    if os.path.isdir(path):
+        for directory, subdirectories, files in os.walk(path):
+            # Skip hidden folders such as .git or .obsidian
+            subdirectories[:] = sorted(d for d in subdirectories if not d.startswith('.'))
+            for name in sorted(files):
+                if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                    file_path = os.path.join(directory, name)
+                    yield os.path.relpath(file_path, path), file_path
+    else:
+        with open(path, encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield f"{os.path.basename(path)}:{number}", line
+
+def chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def parse_sources(path, workers=None):
+    """Yield (source, note, error) for everything under path, in order."""
+    kind = 'markdown' if os.path.isdir(path) else 'jsonl'
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = deque()
+        for chunk in chunks(iter_sources(path), CHUNK_SIZE):
+            in_flight.append(pool.submit(_parse_chunk, kind, chunk, path))
+            if len(in_flight) >= CHUNKS_IN_FLIGHT:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+def bulk_import(db, path, batch_size=500, workers=None, progress=None):
+    """Import every note under path, a directory of Markdown files or a JSONL archive.
+
+    progress(imported, errors) is called after each committed batch.
+    Returns an ImportReport with the number of notes imported and a list
+    of (source, message) for the ones that failed.
+    """
+    imported = 0
+    errors = []
+    batch = []
+
+    def commit():
+        nonlocal imported, batch
+        try:
+            db.insert_notes([note for _, note in batch])
+            imported += len(batch)
+        except Exception:
+            # One bad row fails its whole batch, retry the notes one by one
+            for source, note in batch:
+                try:
+                    db.insert_notes([note])
+                    imported += 1
+                except Exception as e:
+                    errors.append((source, str(e)))
+        batch = []
+        if progress:
+            progress(imported, errors)
+
+    for source, note, error in parse_sources(path, workers):
+        if error:
+            errors.append((source, error))
+            continue
+        # Archives written by bulk_export inline attachments as data: URIs
+        note['content'] = db.store_attachments(note['content'])
+        batch.append((source, note))
+        if len(batch) >= batch_size:
+            commit()
+    if batch:
+        commit()
+    return ImportReport(imported, errors)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="directory of Markdown files or JSONL archive")
+    parser.add_argument("--db", help="database file (default: the app's)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    def report(imported, errors):
+        print(f"\rImported {imported} notes, {len(errors)} errors", end="", file=sys.stderr)
+
+    db = Database(db_file=args.db, compression="zlib")
+    result = bulk_import(db, args.source, args.batch_size, args.workers, progress=report)
+    print(file=sys.stderr)
+    for source, message in result.errors:
+        print(f"Error importing {source}: {message}", file=sys.stderr)
+    db.close()
+    return 1 if result.errors else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
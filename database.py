@@ -1,10 +1,22 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, ForeignKey, Enum
+from sqlalchemy import (create_engine, event, inspect, Column, Integer, String, Text, DateTime, ForeignKey,
+                        Enum, LargeBinary, Boolean, Index, TypeDecorator, table, column, text, func,
+                        Float, select, insert, delete, literal_column, tuple_, or_, and_)
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from sqlalchemy.orm import sessionmaker, relationship, deferred, undefer, undefer_group
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import difflib
+import lzma
+import zlib
 import os
 import enum
 import json
+import re
+import base64
+import hashlib
+import sqlite3
+import threading
 
 Base = declarative_base()
 
@@ -15,25 +27,66 @@ class NoteCategory(enum.Enum):
     IDEAS = "Ideas"
     TASKS = "Tasks"
 
+# Codecs for CompressedText. The codec id is the first byte of the stored value.
+CODECS = {
+    'zlib': (b'Z', zlib.compress, zlib.decompress),
+    'lzma': (b'X', lzma.compress, lzma.decompress),
+}
+_DECOMPRESSORS = {codec_id: decompress for codec_id, _, decompress in CODECS.values()}
+
+def decompress_text(value):
+    """Text of a CompressedText column value, which may be plain text."""
+    if isinstance(value, bytes):
+        return _DECOMPRESSORS[value[:1]](value[1:]).decode('utf-8')
+    return value
+
+class CompressedText(TypeDecorator):
+    """Text column that compresses values above a size threshold.
+
+    Compressed values are stored as a BLOB prefixed with the codec id, the
+    rest as plain TEXT, so existing rows keep reading back unchanged.
+    Compression is set per engine, as a (codec, threshold) pair in the
+    text_compression attribute of its dialect, which Database(compression=...)
+    sets. Without it values are stored uncompressed.
+    """
+    impl = Text
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        codec, threshold = getattr(dialect, 'text_compression', (None, 0))
+        if value is None or codec is None or len(value) < threshold:
+            return value
+        codec_id, compress, _ = CODECS[codec]
+        return codec_id + compress(value.encode('utf-8'))
+    
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
 class Note(Base):
     __tablename__ = 'notes'
     
     id = Column(Integer, primary_key=True)
     title = Column(String(200), nullable=False)
-    content = Column(Text, nullable=True)
-    html_content = Column(Text, nullable=True)  # Store formatted content
+    # Bodies are only loaded (and decompressed) when accessed, listing never needs them
+    content = deferred(Column(CompressedText, nullable=True), group='body')
     category = Column(Enum(NoteCategory), default=NoteCategory.ALL)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     tags = Column(String(500), nullable=True)  # Comma-separated tags
     note_metadata = Column(Text, nullable=True)  # JSON string for additional metadata
 
+    # Listing is always "newest first", optionally within one category. The
+    # trailing columns make both indexes covering for NoteSummary rows.
+    __table_args__ = (
+        Index('ix_notes_recent', 'updated_at', 'id', 'title', 'category', 'created_at'),
+        Index('ix_notes_category_recent', 'category', 'updated_at', 'id', 'title', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
             'title': self.title,
             'content': self.content,
-            'html_content': self.html_content,
             'category': self.category.value if self.category else None,
             'created_at': self.created_at,
             'updated_at': self.updated_at,
@@ -41,77 +94,762 @@ class Note(Base):
             'metadata': json.loads(self.note_metadata) if self.note_metadata else {}
         }
 
+class Tag(Base):
+    """One distinct tag, stored normalized by normalize_tag()."""
+    __tablename__ = 'tags'
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False, unique=True)
+
+class NoteTag(Base):
+    """Links a note to each of its tags.
+
+    Note.tags keeps the comma-separated string as typed, for display and
+    full-text search. These rows are derived from it and make exact tag
+    filters index lookups.
+    """
+    __tablename__ = 'note_tags'
+    
+    note_id = Column(Integer, ForeignKey('notes.id'), primary_key=True)
+    tag_id = Column(Integer, ForeignKey('tags.id'), primary_key=True)
+    
+    __table_args__ = (
+        Index('ix_note_tags_tag_note', 'tag_id', 'note_id'),
+    )
+
+def normalize_tag(name):
+    return name.strip().lstrip('#').strip().lower()[:100]
+
+def split_tags(tags):
+    """Distinct normalized tags of a comma-separated tags string, in order."""
+    names = []
+    for name in (tags or "").split(','):
+        name = normalize_tag(name)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+def _batches(values, size=500):
+    # Keeps IN (...) lists under SQLite's bound parameter limit
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class Attachment(Base):
+    """Binary file referenced from note text as attachment:<hash>.
+
+    Keyed by the SHA-256 of the data, so identical files are stored once.
+    """
+    __tablename__ = 'attachments'
+    
+    hash = Column(String(64), primary_key=True)
+    mime_type = Column(String(100), nullable=False)
+    size = Column(Integer, nullable=False)
+    data = deferred(Column(LargeBinary, nullable=False))
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class NoteRevision(Base):
+    """One saved version of a note's content.
+
+    Snapshots hold the full text, the other revisions a delta against the
+    revision before them. Both are zlib-compressed.
+    """
+    __tablename__ = 'note_revisions'
+    
+    id = Column(Integer, primary_key=True)
+    note_id = Column(Integer, ForeignKey('notes.id'), nullable=False)
+    revision = Column(Integer, nullable=False)  # Counts up from 1 per note
+    is_snapshot = Column(Boolean, nullable=False, default=False)
+    data = deferred(Column(LargeBinary, nullable=False))
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index('ix_note_revisions_note_revision', 'note_id', 'revision', unique=True),
+    )
+
+# At most this many revisions separate a revision from its snapshot, which
+# bounds how many deltas are applied to reconstruct it
+SNAPSHOT_INTERVAL = 20
+# Saves closer together than this replace the latest revision instead of
+# adding one, so autosave while typing does not flood the history
+REVISION_MERGE_SECONDS = 60
+# Revisions kept per note, older ones are dropped by compact_revisions()
+REVISIONS_KEPT = 200
+
+def make_delta(old, new):
+    """Line-based delta turning old into new.
+
+    A JSON list where [start, end] copies old lines start:end and a string
+    is inserted as is.
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            ops.append([i1, i2])
+        elif tag != 'delete':
+            ops.append("".join(new_lines[j1:j2]))
+    return json.dumps(ops, separators=(',', ':'))
+
+def apply_delta(old, delta):
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, list):
+            parts.extend(old_lines[op[0]:op[1]])
+        else:
+            parts.append(op)
+    return "".join(parts)
+
+def pack_text(value):
+    return zlib.compress(value.encode('utf-8'))
+
+def unpack_text(data):
+    return zlib.decompress(data).decode('utf-8')
+
+ATTACHMENT_SCHEME = "attachment"
+
+_ATTACHMENT_URI = re.compile(ATTACHMENT_SCHEME + r':([0-9a-f]{64})')
+_DATA_URI = re.compile(r'data:([\w.+-]+/[\w.+-]+);base64,([A-Za-z0-9+/]+={0,2})')
+
+def attachment_uri(attachment_hash):
+    return f"{ATTACHMENT_SCHEME}:{attachment_hash}"
+
+# Compact row for note lists: everything except the note bodies. rank is
+# set on search results only, where it orders the rows.
+NoteSummary = namedtuple('NoteSummary', ['id', 'title', 'category', 'created_at', 'updated_at', 'rank'],
+                         defaults=(None,))
+
+SUMMARY_COLUMNS = (Note.id, Note.title, Note.category, Note.created_at, Note.updated_at)
+
+def note_summary(note):
+    return NoteSummary(note.id, note.title, note.category, note.created_at, note.updated_at)
+
+class NoteEventKind(enum.Enum):
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+# Published to Database.subscribe() callbacks after a change is committed.
+# summary is the note's NoteSummary after the change, None for deletions.
+NoteEvent = namedtuple('NoteEvent', ['kind', 'note_id', 'summary'])
+
+# External-content FTS5 index over notes. The index stores only tokens; the
+# text itself stays in the notes table and triggers keep both in sync.
+# note_text() is registered on every connection and decompresses bodies
+# stored by CompressedText, notes_text is the decompressed view FTS5 reads.
+NOTES_FTS_DDL = [
+    """CREATE VIEW IF NOT EXISTS notes_text AS
+        SELECT id, title, note_text(content) AS content, tags FROM notes""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+        title, content, tags,
+        content='notes_text', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, title, content, tags)
+        VALUES (new.id, new.title, note_text(new.content), new.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, note_text(old.content), old.tags);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content, tags ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content, tags)
+        VALUES ('delete', old.id, old.title, note_text(old.content), old.tags);
+        INSERT INTO notes_fts(rowid, title, content, tags)
+        VALUES (new.id, new.title, note_text(new.content), new.tags);
+    END""",
+]
+
+# Objects of the first FTS version, which indexed notes.content directly
+LEGACY_FTS_DDL = [
+    "DROP TRIGGER IF EXISTS notes_fts_ai",
+    "DROP TRIGGER IF EXISTS notes_fts_ad",
+    "DROP TRIGGER IF EXISTS notes_fts_au",
+    "DROP TABLE IF EXISTS notes_fts",
+]
+
+notes_fts = table('notes_fts', column('rowid'))
+
+# bm25 column weights: title, content, tags (lower score = better match)
+FTS_RANK = literal_column("bm25(notes_fts, 10.0, 1.0, 5.0)", Float)
+
+_QUERY_TOKEN = re.compile(r'"([^"]*)"|(\S+)')
+_TAG_FILTER = re.compile(r'(?<!\S)tag:("[^"]*"|\S+)', re.I)
+
+def split_tag_filters(query):
+    """Split "tag:name" terms off search bar input, return (tags, rest)."""
+    tags = [normalize_tag(name.strip('"')) for name in _TAG_FILTER.findall(query)]
+    return [name for name in tags if name], _TAG_FILTER.sub(' ', query)
+
+def build_match_query(query):
+    """Translate search bar input into an FTS5 MATCH expression.
+
+    Quoted text becomes a phrase query, every other word a prefix query so
+    results show up while typing. All terms must match. Returns None when the
+    input contains nothing searchable. tag: terms are left to
+    split_tag_filters().
+    """
+    terms = []
+    _, query = split_tag_filters(query)
+    for match in _QUERY_TOKEN.finditer(query):
+        phrase, word = match.groups()
+        if phrase is not None:
+            if re.search(r'\w', phrase):
+                terms.append('"{}"'.format(phrase.replace('"', '""')))
+        elif re.search(r'\w', word):
+            word = word.rstrip('*').replace('"', '""')
+            terms.append(f'"{word}"*')
+    return " ".join(terms) or None
+
+# Performance profile applied to every SQLite connection. Pass pragmas={} to
+# Database() to run with SQLite's defaults instead.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers never block the writer and vice versa
+    'synchronous': 'NORMAL',  # Safe with WAL, skips the fsync per commit
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # Negative means KiB, so 64 MB
+    'temp_store': 'MEMORY',
+}
+
 class Database:
-    def __init__(self):
-        db_path = os.path.join(os.path.expanduser("~"), ".note_typewriter")
-        os.makedirs(db_path, exist_ok=True)
-        db_file = os.path.join(db_path, "notes.db")
-        self.engine = create_engine(f'sqlite:///{db_file}')
+    """Access to the note library, safe to share between threads.
+
+    Every call runs in a session of its own, a unit of work that is closed
+    before it returns, so no identity map outlives it. Returned objects are
+    detached, notes with their content and attachments with their data
+    loaded. Reads use their own pooled connections and run alongside the
+    single writer under WAL.
+    """
+    def __init__(self, db_file=None, pragmas=None, compression=None, compression_threshold=1024,
+                 render_cache=None):
+        if db_file is None:
+            db_path = os.path.join(os.path.expanduser("~"), ".note_typewriter")
+            os.makedirs(db_path, exist_ok=True)
+            db_file = os.path.join(db_path, "notes.db")
+        self.db_file = db_file
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        # A few threads use the database at once: the GUI, search, autosave
+        self.engine = create_engine(f'sqlite:///{db_file}', pool_size=4, max_overflow=4)
+        # None, 'zlib' or 'lzma', applies to note bodies written from now on.
+        # Each engine has its own dialect, so other databases are unaffected.
+        self.engine.dialect.text_compression = (compression, compression_threshold)
+        event.listen(self.engine, "connect", self._on_connect)
+        tags_indexed = inspect(self.engine).has_table('note_tags')
         Base.metadata.create_all(self.engine)
-        Session = sessionmaker(bind=self.engine)
-        self.session = Session()
+        self.create_missing_indexes()
+        if not tags_indexed:
+            self.index_existing_tags()
+        self.drop_rendered_html()
+        self.setup_search_index()
+        # HTML exports are rendered on demand, see export_note()
+        self.render_cache = render_cache
+        self.Session = sessionmaker(bind=self.engine, expire_on_commit=False)
+        # SQLite has one writer at a time, waiting here beats SQLITE_BUSY
+        self._write_lock = threading.RLock()
+        self._subscribers = []
+    
+    def _on_connect(self, dbapi_connection, connection_record):
+        dbapi_connection.create_function("note_text", 1, decompress_text, deterministic=True)
+        cursor = dbapi_connection.cursor()
+        for name, value in self.pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+    
+    @contextmanager
+    def session_scope(self, session=None):
+        """Session for a unit of work that writes, committed on success.
+
+        Rolled back if the block raises. Passing the session of an enclosing
+        scope reuses it, the outer scope then commits.
+        """
+        if session is not None:
+            yield session
+            return
+        with self._write_lock:
+            session = self.Session()
+            try:
+                yield session
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+            finally:
+                session.close()
+    
+    @contextmanager
+    def read_session(self, session=None):
+        """Session for queries, its read transaction ends with the block."""
+        if session is not None:
+            yield session
+            return
+        session = self.Session()
+        try:
+            yield session
+        finally:
+            session.close()
+    
+    def optimize(self):
+        """Let SQLite refresh planner statistics where they are out of date.
+
+        Cheap when nothing changed, meant to be called periodically and on
+        shutdown.
+        """
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA optimize")
+    
+    def checkpoint(self):
+        """Copy committed transactions from the write-ahead log into the
+        database file, syncing both to disk.
+
+        Commits under synchronous=NORMAL are not synced on their own. Returns
+        True when every one is durable, False when readers held part of the
+        log back.
+        """
+        with self.engine.connect() as conn:
+            busy, log, checkpointed = conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+        return not busy and checkpointed == log
+    
+    def close(self):
+        self.optimize()
+        self.engine.dispose()
+    
+    def create_missing_indexes(self):
+        # create_all() skips indexes of tables that already exist
+        for index in Note.__table__.indexes:
+            index.create(self.engine, checkfirst=True)
+    
+    def drop_rendered_html(self):
+        # Rendered HTML used to be stored next to the content, it now comes
+        # from the render cache
+        with self.engine.begin() as conn:
+            columns = [row[1] for row in conn.exec_driver_sql("PRAGMA table_info(notes)")]
+            if 'html_content' not in columns:
+                return
+            if sqlite3.sqlite_version_info >= (3, 35, 0):
+                conn.exec_driver_sql("ALTER TABLE notes DROP COLUMN html_content")
+            else:
+                conn.exec_driver_sql("UPDATE notes SET html_content = NULL WHERE html_content IS NOT NULL")
     
-    def create_note(self, title, content="", html_content="", category=NoteCategory.ALL, tags="", metadata=None):
+    def index_existing_tags(self):
+        # One-time split of the tags strings written before note_tags existed
+        with self.engine.begin() as conn:
+            rows = conn.execute(select(Note.id, Note.tags).where(Note.tags != "")).all()
+            self._store_tags(conn, dict(rows), new=True)
+    
+    def setup_search_index(self):
+        with self.engine.begin() as conn:
+            existing = conn.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+            ).first()
+            if existing and "content='notes_text'" not in existing[0]:
+                for statement in LEGACY_FTS_DDL:
+                    conn.exec_driver_sql(statement)
+                existing = None
+            for statement in NOTES_FTS_DDL:
+                conn.exec_driver_sql(statement)
+            if not existing:
+                # One-time backfill of notes created before the index existed
+                conn.exec_driver_sql("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+    
+    def subscribe(self, callback):
+        """Call callback(event) with a NoteEvent for every committed change.
+
+        Callbacks run on the thread that made the change.
+        """
+        self._subscribers.append(callback)
+    
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+    
+    def _publish(self, kind, note_id, summary=None):
+        event = NoteEvent(kind, note_id, summary)
+        for callback in list(self._subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error handling note event: {e}")
+    
+    def create_note(self, title, content="", category=NoteCategory.ALL, tags="", metadata=None):
         note = Note(
             title=title,
             content=content,
-            html_content=html_content,
             category=category,
             tags=tags,
             note_metadata=json.dumps(metadata) if metadata else None
         )
-        self.session.add(note)
-        self.session.commit()
+        with self.session_scope() as session:
+            session.add(note)
+            session.flush()
+            self.record_revision(session, note.id, None, content or "")
+            self._store_tags(session.connection(), {note.id: tags}, new=True)
+            summary = note_summary(note)
+        self._publish(NoteEventKind.CREATED, note.id, summary)
         return note
     
-    def get_note(self, note_id):
-        return self.session.query(Note).filter(Note.id == note_id).first()
+    def get_note(self, note_id, session=None):
+        """The note with its content loaded, or None."""
+        with self.read_session(session) as session:
+            return session.query(Note).options(undefer_group('body')).filter(
+                Note.id == note_id
+            ).first()
+    
+    def _store_tags(self, conn, note_tags, new=False):
+        """Replace the note_tags rows of notes, note_tags maps a note id to its tags string.
+
+        Pass new=True when the notes have no rows yet. Tags no longer used by
+        any note are removed.
+        """
+        if not new:
+            old_tag_ids = set()
+            for ids in _batches(list(note_tags)):
+                old_tag_ids.update(conn.execute(
+                    select(NoteTag.tag_id).where(NoteTag.note_id.in_(ids))).scalars())
+                conn.execute(delete(NoteTag).where(NoteTag.note_id.in_(ids)))
+        names = {note_id: split_tags(tags) for note_id, tags in note_tags.items()}
+        distinct = sorted({name for tags in names.values() for name in tags})
+        tag_ids = {}
+        for batch in _batches(distinct):
+            conn.execute(insert(Tag).prefix_with("OR IGNORE"), [{'name': name} for name in batch])
+            tag_ids.update(conn.execute(select(Tag.name, Tag.id).where(Tag.name.in_(batch))).all())
+        rows = [{'note_id': note_id, 'tag_id': tag_ids[name]}
+                for note_id, tags in names.items() for name in tags]
+        if rows:
+            conn.execute(insert(NoteTag), rows)
+        if not new:
+            unused = old_tag_ids - set(tag_ids.values())
+            for ids in _batches(list(unused)):
+                conn.execute(delete(Tag).where(
+                    Tag.id.in_(ids),
+                    ~select(NoteTag.note_id).where(NoteTag.tag_id == Tag.id).exists()
+                ))
+    
+    def _filter_tags(self, query, tags, match_all=True):
+        """Keep notes tagged with all of tags, or any of them if not match_all."""
+        names = split_tags(",".join(tags))
+        tagged = select(NoteTag.note_id).join(Tag, Tag.id == NoteTag.tag_id).where(Tag.name.in_(names))
+        if match_all and len(names) > 1:
+            tagged = tagged.group_by(NoteTag.note_id).having(func.count() == len(names))
+        return query.filter(Note.id.in_(tagged))
     
-    def get_all_notes(self, category=None):
-        query = self.session.query(Note)
+    def _list_query(self, session, category=None, columns=(Note,), tags=None, match_all=True,
+                    after=None):
+        query = session.query(*columns)
         if category and category != NoteCategory.ALL:
             query = query.filter(Note.category == category)
-        return query.order_by(Note.updated_at.desc()).all()
+        if tags:
+            query = self._filter_tags(query, tags, match_all)
+        if after is not None:
+            # Keyset pagination: a range scan of the index, however deep the page
+            query = query.filter(tuple_(Note.updated_at, Note.id) < tuple_(after.updated_at, after.id))
+        return query.order_by(Note.updated_at.desc(), Note.id.desc())
+    
+    def get_all_notes(self, category=None, session=None, tags=None, match_all=True):
+        with self.read_session(session) as session:
+            query = self._list_query(session, category, tags=tags, match_all=match_all)
+            # Notes outlive the session, their content has to be loaded now
+            return query.options(undefer_group('body')).all()
+    
+    def iter_notes(self, category=None, chunk_size=500):
+        """Yield every note with its content, in id order.
+
+        Notes are read chunk_size at a time, each chunk in a short-lived
+        session, so memory use does not grow with the number of notes.
+        """
+        last_id = 0
+        while True:
+            session = self.Session()
+            try:
+                query = session.query(Note).options(undefer_group('body')).filter(Note.id > last_id)
+                if category and category != NoteCategory.ALL:
+                    query = query.filter(Note.category == category)
+                notes = query.order_by(Note.id).limit(chunk_size).all()
+                session.expunge_all()
+            finally:
+                session.close()
+            if not notes:
+                return
+            yield from notes
+            last_id = notes[-1].id
+    
+    def get_note_summaries(self, category=None, session=None, offset=0, limit=None,
+                           tags=None, match_all=True, after=None):
+        """Newest first. tags keeps notes with all of them, any if not match_all.
+
+        Pass the last summary of a page as after to get the page following
+        it, in constant time unlike offset.
+        """
+        with self.read_session(session) as session:
+            query = self._list_query(session, category, SUMMARY_COLUMNS, tags, match_all, after)
+            return [NoteSummary(*row) for row in query.offset(offset).limit(limit)]
+    
+    def iter_note_summaries(self, category=None, tags=None, match_all=True, batch_size=500):
+        """Yield summaries newest first, fetched batch_size rows at a time.
+
+        Reads in a session of its own, which stays open until the generator
+        is exhausted or closed.
+        """
+        session = self.Session()
+        try:
+            query = self._list_query(session, category, SUMMARY_COLUMNS, tags, match_all)
+            for row in query.yield_per(batch_size):
+                yield NoteSummary(*row)
+        finally:
+            session.close()
+    
+    def get_tag_counts(self, category=None):
+        """(tag, note count) pairs, most used first."""
+        count = func.count().label('count')
+        with self.read_session() as session:
+            query = session.query(Tag.name, count).join(NoteTag, NoteTag.tag_id == Tag.id)
+            if category and category != NoteCategory.ALL:
+                query = query.join(Note, Note.id == NoteTag.note_id).filter(Note.category == category)
+            return query.group_by(Tag.id).order_by(count.desc(), Tag.name).all()
+    
+    def get_note_tags(self, note_id):
+        with self.read_session() as session:
+            query = session.query(Tag.name).join(NoteTag, NoteTag.tag_id == Tag.id).filter(
+                NoteTag.note_id == note_id
+            )
+            return [name for name, in query.order_by(Tag.name)]
     
-    def update_note(self, note_id, title=None, content=None, html_content=None,
+    def get_note_summary(self, note_id, session=None):
+        with self.read_session(session) as session:
+            row = session.query(*SUMMARY_COLUMNS).filter(Note.id == note_id).first()
+        return NoteSummary(*row) if row else None
+    
+    def update_note(self, note_id, title=None, content=None,
                    category=None, tags=None, metadata=None):
-        note = self.get_note(note_id)
-        if note:
+        changed = False
+        with self.session_scope() as session:
+            note = self.get_note(note_id, session=session)
+            if not note:
+                return None
+            # First, the revision queries autoflush, which would clear the
+            # pending changes is_modified() looks at below
+            if content is not None and content != note.content:
+                self.record_revision(session, note_id, note.content, content)
+                note.content = content
             if title is not None:
                 note.title = title
-            if content is not None:
-                note.content = content
-            if html_content is not None:
-                note.html_content = html_content
             if category is not None:
                 note.category = category
-            if tags is not None:
+            if tags is not None and tags != note.tags:
                 note.tags = tags
+                self._store_tags(session.connection(), {note_id: tags})
             if metadata is not None:
                 current_metadata = json.loads(note.note_metadata) if note.note_metadata else {}
                 current_metadata.update(metadata)
                 note.note_metadata = json.dumps(current_metadata)
-            self.session.commit()
+            # session.dirty also holds notes whose fields were set to the same value
+            changed = session.is_modified(note)
+            session.flush()
+            summary = note_summary(note)
+        if changed:
+            self._publish(NoteEventKind.UPDATED, note_id, summary)
         return note
     
     def delete_note(self, note_id):
-        note = self.get_note(note_id)
-        if note:
-            self.session.delete(note)
-            self.session.commit()
-            return True
-        return False
-    
-    def search_notes(self, query, category=None):
-        db_query = self.session.query(Note)
+        with self.session_scope() as session:
+            note = session.get(Note, note_id)
+            if not note:
+                return False
+            session.query(NoteRevision).filter(NoteRevision.note_id == note_id).delete()
+            self._store_tags(session.connection(), {note_id: ""})
+            session.delete(note)
+        self._publish(NoteEventKind.DELETED, note_id)
+        return True
+    
+    def record_revision(self, session, note_id, old_content, content):
+        """Add content as the newest revision of a note, without committing.
+
+        old_content must be the content of the latest revision, the note's
+        stored content before this change.
+        """
+        latest = session.query(NoteRevision).filter(
+            NoteRevision.note_id == note_id
+        ).order_by(NoteRevision.revision.desc()).first()
+        
+        if latest is None and old_content is not None:
+            # Notes from before revisions were kept have none yet, their
+            # current text becomes the first revision so it is not lost
+            latest = NoteRevision(note_id=note_id, revision=1, is_snapshot=True, data=pack_text(old_content))
+            session.add(latest)
+            session.flush()
+        elif latest and latest.created_at > datetime.utcnow() - timedelta(seconds=REVISION_MERGE_SECONDS):
+            # Rewrite the latest revision so it holds content instead
+            if latest.is_snapshot:
+                latest.data = pack_text(content)
+            else:
+                base = self.get_revision_content(note_id, latest.revision - 1, session=session)
+                latest.data = pack_text(make_delta(base, content))
+            return latest
+        
+        revision = latest.revision + 1 if latest else 1
+        last_snapshot = session.query(NoteRevision.revision).filter(
+            NoteRevision.note_id == note_id, NoteRevision.is_snapshot.is_(True)
+        ).order_by(NoteRevision.revision.desc()).first()
+        
+        data = None
+        if latest and last_snapshot and revision - last_snapshot[0] < SNAPSHOT_INTERVAL:
+            data = pack_text(make_delta(old_content or "", content))
+        snapshot = pack_text(content)
+        if data is None or len(data) >= len(snapshot):
+            data = snapshot
+        
+        entry = NoteRevision(note_id=note_id, revision=revision, is_snapshot=data is snapshot, data=data)
+        session.add(entry)
+        if entry.is_snapshot and revision > REVISIONS_KEPT:
+            session.flush()
+            self.compact_revisions(note_id, session=session)
+        return entry
+    
+    def get_revisions(self, note_id, session=None):
+        """Revisions of a note, oldest first. Use get_revision_content() for the text."""
+        with self.read_session(session) as session:
+            return session.query(NoteRevision).filter(
+                NoteRevision.note_id == note_id
+            ).order_by(NoteRevision.revision).all()
+    
+    def get_revision_content(self, note_id, revision, session=None):
+        """Content of a note at revision, or None if it does not exist.
+
+        Loads the nearest snapshot at or before revision and applies the
+        deltas after it, fewer than SNAPSHOT_INTERVAL of them.
+        """
+        with self.read_session(session) as session:
+            snapshot = session.query(NoteRevision.revision).filter(
+                NoteRevision.note_id == note_id,
+                NoteRevision.revision <= revision,
+                NoteRevision.is_snapshot.is_(True)
+            ).order_by(NoteRevision.revision.desc()).first()
+            if snapshot is None:
+                return None
+        
+            chain = session.query(NoteRevision.revision, NoteRevision.data).filter(
+                NoteRevision.note_id == note_id,
+                NoteRevision.revision >= snapshot[0],
+                NoteRevision.revision <= revision
+            ).order_by(NoteRevision.revision).all()
+            if chain[-1][0] != revision:
+                return None
+        
+            content = unpack_text(chain[0][1])
+            for _, data in chain[1:]:
+                content = apply_delta(content, unpack_text(data))
+            return content
+    
+    def compact_revisions(self, note_id, keep=None, session=None):
+        """Drop all but the newest keep (REVISIONS_KEPT) revisions.
+
+        The oldest revision kept is turned into a snapshot first so the
+        remaining deltas can still be applied. Within session, when given,
+        the caller commits.
+        """
+        with self.session_scope(session) as session:
+            keep = keep or REVISIONS_KEPT
+            cutoff = session.query(NoteRevision).filter(
+                NoteRevision.note_id == note_id
+            ).order_by(NoteRevision.revision.desc()).offset(keep - 1).first()
+            if cutoff is None:
+                return 0
+            if not cutoff.is_snapshot:
+                content = self.get_revision_content(note_id, cutoff.revision, session=session)
+                cutoff.data = pack_text(content)
+                cutoff.is_snapshot = True
+            return session.query(NoteRevision).filter(
+                NoteRevision.note_id == note_id,
+                NoteRevision.revision < cutoff.revision
+            ).delete()
+    
+    def _search_query(self, session, match_query, category=None, columns=(Note,), tags=None,
+                      after=None):
+        query = session.query(*columns).join(notes_fts, notes_fts.c.rowid == Note.id)
         if category and category != NoteCategory.ALL:
-            db_query = db_query.filter(Note.category == category)
+            query = query.filter(Note.category == category)
+        if tags:
+            query = self._filter_tags(query, tags)
+        if after is not None:
+            query = query.filter(or_(FTS_RANK > after.rank, and_(
+                FTS_RANK == after.rank,
+                tuple_(Note.updated_at, Note.id) < tuple_(after.updated_at, after.id)
+            )))
         
-        return db_query.filter(
-            (Note.title.ilike(f"%{query}%")) |
-            (Note.content.ilike(f"%{query}%")) |
-            (Note.tags.ilike(f"%{query}%"))
-        ).order_by(Note.updated_at.desc()).all()
+        return query.filter(
+            text("notes_fts MATCH :match_query")
+        ).params(match_query=match_query).order_by(FTS_RANK, Note.updated_at.desc(), Note.id.desc())
+    
+    def search_notes(self, query, category=None, session=None):
+        """Full-text search, "tag:name" terms keep notes with that exact tag."""
+        tags, _ = split_tag_filters(query)
+        match_query = build_match_query(query)
+        if not match_query:
+            return self.get_all_notes(category=category, session=session, tags=tags)
+        with self.read_session(session) as session:
+            query = self._search_query(session, match_query, category, tags=tags)
+            return query.options(undefer_group('body')).all()
+    
+    def search_note_summaries(self, query, category=None, session=None, offset=0, limit=None,
+                              after=None):
+        """Best match first, after works as in get_note_summaries()."""
+        tags, _ = split_tag_filters(query)
+        match_query = build_match_query(query)
+        if not match_query:
+            return self.get_note_summaries(category=category, session=session,
+                                           offset=offset, limit=limit, tags=tags, after=after)
+        with self.read_session(session) as session:
+            rows = self._search_query(session, match_query, category, SUMMARY_COLUMNS + (FTS_RANK,),
+                                      tags, after)
+            return [NoteSummary(*row) for row in rows.offset(offset).limit(limit)]
+    
+    def add_attachment(self, data, mime_type="application/octet-stream"):
+        """Store data unless an identical attachment exists, return its hash."""
+        attachment_hash = hashlib.sha256(data).hexdigest()
+        with self.session_scope() as session:
+            if session.get(Attachment, attachment_hash) is None:
+                session.add(Attachment(
+                    hash=attachment_hash,
+                    mime_type=mime_type,
+                    size=len(data),
+                    data=data
+                ))
+        return attachment_hash
+    
+    def get_attachment(self, attachment_hash):
+        with self.read_session() as session:
+            return session.get(Attachment, attachment_hash, options=[undefer(Attachment.data)])
+    
+    def resolve_attachments(self, text):
+        """Replace attachment: URIs in text with self-contained data: URIs."""
+        def to_data_uri(match):
+            attachment = self.get_attachment(match.group(1))
+            if attachment is None:
+                return match.group(0)
+            encoded = base64.b64encode(attachment.data).decode()
+            return f"data:{attachment.mime_type};base64,{encoded}"
+        return _ATTACHMENT_URI.sub(to_data_uri, text)
+    
+    def store_attachments(self, text):
+        """Move base64 data: URIs in text into attachments, the reverse of
+        resolve_attachments(). Returns text with attachment: URIs."""
+        if 'data:' not in text:
+            return text
+        def to_attachment_uri(match):
+            try:
+                data = base64.b64decode(match.group(2), validate=True)
+            except ValueError:
+                return match.group(0)
+            return attachment_uri(self.add_attachment(data, match.group(1)))
+        return _DATA_URI.sub(to_attachment_uri, text)
+    
+    def _render_cache(self):
+        if self.render_cache is None:
+            # Markdown is only imported by the callers that render
+            from renderer import RenderCache
+            self.render_cache = RenderCache()
+        return self.render_cache
     
     def export_note(self, note_id, format="markdown"):
         note = self.get_note(note_id)
@@ -127,7 +865,7 @@ class Database:
         elif format == "html":
             return {
                 'title': note.title,
-                'content': note.html_content or note.content,
+                'content': self._render_cache().render(note.content or ""),
                 'metadata': note.to_dict()
             }
         return None
@@ -149,4 +887,133 @@ class Database:
             )
         except Exception as e:
             print(f"Error importing note: {e}")
-            return None 
\ No newline at end of file
+            return None
+    
+    def insert_notes(self, notes):
+        """Insert many notes in one transaction, return their ids.
+
+        notes are dicts with the keys title, content, category, tags,
+        metadata, created_at and updated_at, all but title may be None.
+        Rows go in as batched statements instead of one ORM flush each.
+        """
+        now = datetime.utcnow()
+        rows = [{
+            'title': note['title'],
+            'content': note.get('content') or "",
+            'category': note.get('category') or NoteCategory.ALL,
+            'tags': note.get('tags') or "",
+            'note_metadata': json.dumps(note['metadata'], default=str) if note.get('metadata') else None,
+            'created_at': note.get('created_at') or now,
+            'updated_at': note.get('updated_at') or note.get('created_at') or now,
+        } for note in notes]
+        if not rows:
+            return []
+        with self._write_lock, self.engine.begin() as conn:
+            ids = conn.execute(
+                Note.__table__.insert().returning(Note.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+            conn.execute(NoteRevision.__table__.insert(), [{
+                'note_id': note_id,
+                'revision': 1,
+                'is_snapshot': True,
+                'data': pack_text(row['content']),
+                'created_at': now,
+            } for note_id, row in zip(ids, rows)])
+            self._store_tags(conn, {note_id: row['tags'] for note_id, row in zip(ids, rows)}, new=True)
+        if self._subscribers:
+            for note_id, row in zip(ids, rows):
+                summary = NoteSummary(note_id, row['title'], row['category'],
+                                      row['created_at'], row['updated_at'])
+                self._publish(NoteEventKind.CREATED, note_id, summary)
+        return ids
+    
+    def vacuum(self):
+        """Compact the search index and the database file, return the bytes freed.
+
+        Also prunes the disk tier of render_cache.
+        """
+        before = self.file_size()
+        with self._write_lock, self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("INSERT INTO notes_fts(notes_fts) VALUES ('optimize')")
+            conn.exec_driver_sql("VACUUM")
+            conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)")
+            conn.exec_driver_sql("PRAGMA optimize")
+        if self.render_cache is not None:
+            self.render_cache.prune()
+        return before - self.file_size()
+    
+    def file_size(self):
+        """Bytes used on disk by the database, including its write-ahead log."""
+        return sum(
+            os.path.getsize(self.db_file + suffix)
+            for suffix in ("", "-wal") if os.path.exists(self.db_file + suffix)
+        )
+    
+    def stats(self):
+        """Counts and sizes describing the library, as a dict."""
+        with self.engine.connect() as conn:
+            def scalar(sql):
+                return conn.exec_driver_sql(sql).scalar() or 0
+            categories = {
+                NoteCategory[name].value: count for name, count in conn.exec_driver_sql(
+                    "SELECT category, count(*) FROM notes GROUP BY category")
+            }
+            page_size = scalar("PRAGMA page_size")
+            return {
+                'notes': scalar("SELECT count(*) FROM notes"),
+                'categories': categories,
+                'content_bytes': scalar("SELECT sum(length(CAST(content AS BLOB))) FROM notes"),
+                'revisions': scalar("SELECT count(*) FROM note_revisions"),
+                'revision_bytes': scalar("SELECT sum(length(data)) FROM note_revisions"),
+                'tags': scalar("SELECT count(*) FROM tags"),
+                'attachments': scalar("SELECT count(*) FROM attachments"),
+                'attachment_bytes': scalar("SELECT sum(size) FROM attachments"),
+                'file_bytes': self.file_size(),
+                'free_bytes': scalar("PRAGMA freelist_count") * page_size,
+            }
+    
+    def explain_query_plans(self):
+        """Return the SQLite query plan of each query issued by this class.
+
+        A detail line like "SCAN notes" (without "USING ... INDEX") means the
+        query reads the whole table. Bound values are placeholders, plans
+        do not depend on them.
+        """
+        cursor = NoteSummary(0, "", None, datetime.utcnow(), datetime.utcnow(), 0.0)
+        with self.read_session() as session:
+            queries = {
+                'get_note': session.query(Note).filter(Note.id == 0),
+                'get_note_summary': session.query(*SUMMARY_COLUMNS).filter(Note.id == 0),
+                'get_note_summaries': self._list_query(session, None, SUMMARY_COLUMNS),
+                'get_note_summaries(category)': self._list_query(session, NoteCategory.WORK, SUMMARY_COLUMNS),
+                'get_note_summaries(after)': self._list_query(session, None, SUMMARY_COLUMNS, after=cursor),
+                'get_note_summaries(category, after)': self._list_query(
+                    session, NoteCategory.WORK, SUMMARY_COLUMNS, after=cursor),
+                'get_all_notes(category)': self._list_query(session, NoteCategory.WORK),
+                'search_note_summaries': self._search_query(session, '"x"*', None, SUMMARY_COLUMNS),
+                'search_note_summaries(category)': self._search_query(session, '"x"*', NoteCategory.WORK, SUMMARY_COLUMNS),
+                'get_note_summaries(tag)': self._list_query(session, None, SUMMARY_COLUMNS, ['x']),
+                'get_note_summaries(all tags)': self._list_query(session, None, SUMMARY_COLUMNS, ['x', 'y']),
+                'get_tag_counts': session.query(Tag.name, func.count()).join(
+                    NoteTag, NoteTag.tag_id == Tag.id).group_by(Tag.id),
+            }
+        
+        plans = {}
+        with self.engine.connect() as conn:
+            for name, query in queries.items():
+                compiled = query.statement.compile(dialect=self.engine.dialect,
+                                                  compile_kwargs={"render_postcompile": True})
+                params = compiled.construct_params()
+                values = tuple(
+                    params[key].name if isinstance(params[key], enum.Enum) else params[key]
+                    for key in compiled.positiontup
+                )
+                rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", values)
+                plans[name] = [row[-1] for row in rows]
+        return plans
+
+if __name__ == '__main__':
+    for name, plan in Database().explain_query_plans().items():
+        print(name)
+        for detail in plan:
+            print(f"    {detail}")
@@ -0,0 +1,31 @@
+import os
+import time
+
+def prune_cache_dir(cache_dir, max_bytes, max_age):
+    """Delete files of cache_dir unused for max_age seconds, then the least
+    recently used ones until the rest fit in max_bytes.
+
+    The modification time of a file is its last use, readers refresh it
+    with os.utime(). Returns the number of files deleted.
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort(reverse=True)
+    cutoff = time.time() - max_age
+    total = 0
+    deleted = 0
+    for mtime, size, path in entries:
+        total += size
+        if mtime >= cutoff and total <= max_bytes:
+            continue
+        try:
+            os.remove(path)
+            deleted += 1
+        except OSError:
+            pass
+    return deleted
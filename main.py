@@ -1,16 +1,60 @@
 import sys
-from PySide6.QtWidgets import QApplication, QFileDialog, QColorDialog, QMessageBox, QInputDialog
+import os
+from PySide6.QtWidgets import QApplication, QFileDialog, QMessageBox, QInputDialog
 from PySide6.QtCore import QTimer
-from PySide6.QtGui import QTextCharFormat, QColor
-import markdown
-import json
-from database import Database, NoteCategory
+import hashlib
+from autosave import WriteBehindQueue
+from renderer import RenderCache
 from ui.main_window import MainWindow
+from ui.note_documents import NoteDocumentCache, make_document
+from ui.note_list_model import NoteListModel
+from ui.workers import SearchController, SignalBridge, DocumentPrefetcher
+
+# Delay between the first unsaved keystroke and the save it triggers
+AUTOSAVE_DELAY_MS = 2000
+
+# Opened notes whose editor documents are kept for switching back
+DOCUMENT_CACHE_SIZE = 16
+# Rows above and below the opened note whose documents are built ahead
+PREFETCH_DISTANCE = 2
+
+# How often SQLite gets to refresh its query planner statistics
+OPTIMIZE_INTERVAL_MS = 60 * 60 * 1000
+
+def state_hash(text):
+    return hashlib.blake2b((text or "").encode(), digest_size=16).digest()
 
 class NoteTypewriter:
-    def __init__(self):
-        self.db = Database()
-        self.window = MainWindow()
+    def __init__(self, window=None):
+        # SQLAlchemy takes longer to import than the window takes to show,
+        # main() only loads it once the window is on screen
+        from database import Database, NoteCategory
+        
+        # Rendered HTML is cached instead of stored, shared by preview and exports
+        self.render_cache = RenderCache(cache_dir=os.path.join(
+            os.path.expanduser("~"), ".note_typewriter", "render_cache"))
+        self.db = Database(compression="zlib", render_cache=self.render_cache)
+        self.window = window or MainWindow()
+        self.window.editor_widget.set_attachment_store(self.db)
+        self.window.preview.set_render_cache(self.render_cache)
+        self.search = SearchController(self.db, limit=NoteListModel.PAGE_SIZE)
+        self.search.results_ready.connect(self.show_search_results)
+        
+        # Switching notes swaps in a ready document instead of reading and
+        # parsing the note, see load_note()
+        self.documents = NoteDocumentCache(self.window.editor, DOCUMENT_CACHE_SIZE)
+        self.prefetcher = DocumentPrefetcher(self.db)
+        self.prefetcher.loaded.connect(self.note_prefetched)
+        
+        # The note list follows the database's change events, which arrive
+        # on the autosave thread for saves
+        self.note_events = SignalBridge()
+        self.note_events.emitted.connect(self.note_changed)
+        self.db.subscribe(self.note_events.emitted.emit)
+        
+        # Saves are committed on a background thread, see save_note()
+        self.autosave = WriteBehindQueue(self.db)
+        recovered = self.autosave.replay()
         
         # Connect signals
         self.window.note_selected.connect(self.load_note)
@@ -23,21 +67,42 @@ class NoteTypewriter:
         self.window.save_note_requested.connect(self.save_note)
         self.window.export_requested.connect(self.export_note)
         
-        # Set up auto-save timer
+        # Set up auto-save timer, started by the first edit after a save
         self.auto_save_timer = QTimer()
+        self.auto_save_timer.setSingleShot(True)
+        self.auto_save_timer.setInterval(AUTOSAVE_DELAY_MS)
         self.auto_save_timer.timeout.connect(self.auto_save)
-        self.auto_save_timer.start(30000)  # Auto-save every 30 seconds
+        self.window.editor.textChanged.connect(self.schedule_auto_save)
+        self.window.tags_input.textEdited.connect(self.schedule_auto_save)
+        
+        self.optimize_timer = QTimer()
+        self.optimize_timer.timeout.connect(self.db.optimize)
+        self.optimize_timer.start(OPTIMIZE_INTERVAL_MS)
         
         # Initialize state
         self.current_note = None
         self.current_category = NoteCategory.ALL
+        # Hashes of the current note's fields as last read from / written to the DB
+        self.saved_hashes = {}
         
         # Load existing notes
         self.refresh_notes()
+        if recovered:
+            self.window.statusBar.showMessage(
+                f"Recovered unsaved changes to {len(recovered)} note(s)", 5000)
     
     def refresh_notes(self):
-        notes = self.db.get_all_notes(category=self.current_category)
-        self.window.refresh_note_list(notes)
+        self.search.cancel()
+        category = self.current_category
+        self.window.refresh_note_list(
+            lambda after, limit: self.db.get_note_summaries(
+                category=category, after=after, limit=limit),
+            accept=self.in_current_category
+        )
+    
+    def in_current_category(self, summary):
+        from database import NoteCategory
+        return self.current_category == NoteCategory.ALL or summary.category == self.current_category
     
     def new_note(self):
         title, ok = QInputDialog.getText(self.window, "New Note", "Enter note title:")
@@ -46,37 +111,90 @@ class NoteTypewriter:
                 title=title,
                 category=self.current_category
             )
-            self.refresh_notes()
             self.load_note(note.id)
     
     def load_note(self, note_id):
-        note = self.db.get_note(note_id)
-        if note:
-            self.current_note = note
-            self.window.set_note_content(
-                note.title,
-                note.content,
-                note.tags,
-                metadata={
-                    'created_at': note.created_at,
-                    'updated_at': note.updated_at
-                }
-            )
+        self.save_note()
+        opened = self.documents.get(note_id)
+        if opened is None:
+            note = self.db.get_note(note_id)
+            if not note:
+                return
+            # Edits still on their way to the database are newer than the row
+            fields = {'content': note.content, 'tags': note.tags}
+            fields.update(self.autosave.pending_fields(note_id))
+            note.tags = fields['tags']
+            document = make_document(fields['content'])
+            # Hashed as the editor returns it, which normalizes line breaks and
+            # non-breaking spaces, so opening a note alone never saves it
+            opened = self.documents.put(note, document, {
+                'content': state_hash(document.toPlainText()),
+                'tags': state_hash(fields['tags'])
+            })
+        note = opened.note
+        self.current_note = note
+        self.saved_hashes = opened.saved_hashes
+        self.documents.show(opened)
+        self.window.set_note_details(note.tags, metadata={
+            'created_at': note.created_at,
+            'updated_at': note.updated_at
+        })
+        self.prefetcher.prefetch([
+            neighbour for neighbour in self.window.note_model.neighbour_ids(note_id, PREFETCH_DISTANCE)
+            if neighbour not in self.documents
+        ])
+    
+    def note_prefetched(self, note, document):
+        # Skip notes opened, edited or removed from the list since they were requested
+        if (note.id in self.documents or self.autosave.pending_fields(note.id)
+                or self.window.note_model.row_of(note.id) < 0):
+            document.deleteLater()
+            return
+        self.documents.put(note, document, {
+            'content': state_hash(document.toPlainText()),
+            'tags': state_hash(note.tags)
+        })
     
     def save_note(self):
-        if self.current_note:
-            content = self.window.get_note_content()
-            html_content = self.window.editor_widget.preview.md.convert(content)
-            self.db.update_note(
-                self.current_note.id,
-                content=content,
-                html_content=html_content,
-                tags=self.window.get_note_tags()
-            )
-            self.refresh_notes()
+        if not self.current_note:
+            return
+        
+        fields = {
+            'content': self.window.get_note_content(),
+            'tags': self.window.get_note_tags()
+        }
+        hashes = {name: state_hash(value) for name, value in fields.items()}
+        changes = {
+            name: value for name, value in fields.items()
+            if hashes[name] != self.saved_hashes.get(name)
+        }
+        self.window.editor.document().setModified(False)
+        if not changes:
+            return
+        
+        self.autosave.submit(self.current_note.id, **changes)
+        # Updated in place, the document cache holds the same dict
+        self.saved_hashes.update(hashes)
+        self.current_note.tags = fields['tags']
+    
+    def note_changed(self, event):
+        from database import NoteEventKind
+        model = self.window.note_model
+        if event.kind == NoteEventKind.CREATED:
+            model.note_created(event.summary)
+        elif event.kind == NoteEventKind.UPDATED:
+            model.note_updated(event.summary)
+            self.documents.note_updated(event.summary)
+        else:
+            model.note_removed(event.note_id)
+            self.documents.discard(event.note_id)
+    
+    def schedule_auto_save(self):
+        if self.current_note and not self.auto_save_timer.isActive():
+            self.auto_save_timer.start()
     
     def auto_save(self):
-        if self.current_note and self.window.editor.document().isModified():
+        if self.current_note:
             self.save_note()
     
     def delete_note(self, note_id):
@@ -88,15 +206,39 @@ class NoteTypewriter:
         if reply == QMessageBox.Yes:
             self.db.delete_note(note_id)
             self.current_note = None
-            self.window.editor.clear()
+            self.documents.discard(note_id)
+            self.documents.show_blank()
             self.window.tags_input.clear()
-            self.refresh_notes()
     
     def search_notes(self, query):
-        notes = self.db.search_notes(query, category=self.current_category)
-        self.window.refresh_note_list(notes)
+        self.search.search(query, category=self.current_category)
+    
+    def show_search_results(self, query, category, notes):
+        from database import build_match_query, split_tag_filters
+        tags, _ = split_tag_filters(query)
+        
+        def accept(summary):
+            # Created or updated notes need every tag: term of the search to join the list
+            return self.in_current_category(summary) and set(tags) <= set(self.db.get_note_tags(summary.id))
+        
+        self.window.refresh_note_list(
+            lambda after, limit: self.db.search_note_summaries(
+                query, category=category, after=after, limit=limit),
+            first_page=notes,
+            ordered_by_recency=build_match_query(query) is None,
+            accept=accept if tags else self.in_current_category
+        )
+    
+    def shutdown(self):
+        self.save_note()
+        self.autosave.stop()
+        self.search.stop()
+        self.prefetcher.stop()
+        self.window.preview.stop_rendering()
+        self.db.close()
     
     def change_category(self, category_name):
+        from database import NoteCategory
         try:
             self.current_category = NoteCategory(category_name)
         except ValueError:
@@ -122,22 +264,25 @@ class NoteTypewriter:
         )
         
         if file_name:
-            note_data = self.db.export_note(self.current_note.id, format=format_type)
+            # HTML and PDF are made from the rendered note, the rest from its Markdown
+            source_format = "html" if format_type in ("html", "pdf") else "markdown"
+            note_data = self.db.export_note(self.current_note.id, format=source_format)
             
             if note_data:
+                # Exported files must not depend on the attachments table
+                note_data['content'] = self.db.resolve_attachments(note_data['content'] or "")
                 try:
                     if format_type == "markdown":
                         with open(file_name, 'w', encoding='utf-8') as f:
                             f.write(f"# {note_data['title']}\n\n")
                             f.write(note_data['content'])
                     elif format_type == "html":
-                        html_content = self.window.editor_widget.preview.md.convert(note_data['content'])
                         with open(file_name, 'w', encoding='utf-8') as f:
                             f.write(f"<h1>{note_data['title']}</h1>\n")
-                            f.write(html_content)
+                            f.write(note_data['content'])
                     elif format_type == "pdf":
                         import pdfkit
-                        html_content = self.window.editor_widget.preview.md.convert(note_data['content'])
+                        html_content = note_data['content']
                         styled_html = f"""
                         <style>
                             body {{
@@ -171,12 +316,21 @@ class NoteTypewriter:
                         f"Failed to export note: {str(e)}"
                     )
 
+def start(app):
+    """Show the main window, then load notes into it."""
+    window = MainWindow()
+    window.show()
+    # Paint the window before the database layer is imported
+    app.processEvents()
+    note_app = NoteTypewriter(window)
+    app.aboutToQuit.connect(note_app.shutdown)
+    return note_app
+
 def main():
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     
-    note_app = NoteTypewriter()
-    note_app.window.show()
+    note_app = start(app)
     
     sys.exit(app.exec())
 
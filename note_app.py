@@ -0,0 +1,148 @@
+"""Command line access to the note library, without the GUI.
+
+Usage: python -m note_app [--db FILE] COMMAND ...
+
+Only the database layer is imported, never Qt, so this is cheap enough to
+call from scripts and shell pipelines. list and search print one note per
+line as "id<TAB>updated<TAB>category<TAB>title".
+"""
+import argparse
+import itertools
+import json
+import sys
+
+from database import Database, NoteCategory
+
+def parse_category(name):
+    for category in NoteCategory:
+        if name.lower() in (category.value.lower(), category.name.lower()):
+            return category
+    raise argparse.ArgumentTypeError(f"unknown category: {name}")
+
+def print_summaries(summaries):
+    for note in summaries:
+        category = note.category.value if note.category else ""
+        print(f"{note.id}\t{note.updated_at:%Y-%m-%d %H:%M}\t{category}\t{note.title}")
+
+def cmd_list(db, args):
+    # Streamed, so listing a large library does not load it all at once
+    summaries = db.iter_note_summaries(category=args.category, tags=args.tag,
+                                       match_all=not args.any_tag)
+    print_summaries(itertools.islice(summaries, args.limit))
+
+def cmd_tags(db, args):
+    for name, count in db.get_tag_counts(category=args.category):
+        print(f"{count}\t{name}")
+
+def cmd_search(db, args):
+    print_summaries(db.search_note_summaries(args.query, category=args.category, limit=args.limit))
+
+def cmd_create(db, args):
+    if args.file:
+        with open(args.file, encoding='utf-8') as f:
+            content = f.read()
+    elif not sys.stdin.isatty():
+        content = sys.stdin.read()
+    else:
+        content = ""
+    note = db.create_note(args.title, content=content,
+                          category=args.category or NoteCategory.ALL, tags=args.tags)
+    print(note.id)
+
+def cmd_import(db, args):
+    from bulk_import import bulk_import
+
+    result = bulk_import(db, args.source, args.batch_size, args.workers)
+    for source, message in result.errors:
+        print(f"Error importing {source}: {message}", file=sys.stderr)
+    print(f"Imported {result.imported} notes, {len(result.errors)} errors", file=sys.stderr)
+    return 1 if result.errors else 0
+
+def cmd_export(db, args):
+    from bulk_export import export_notes
+
+    formats = ("markdown", "html") if args.format == "both" else (args.format,)
+    result = export_notes(db, args.output, formats, args.category, args.incremental, args.workers)
+    print(f"Exported {result.exported} notes, {result.unchanged} unchanged, "
+          f"{result.removed} removed", file=sys.stderr)
+
+def cmd_vacuum(db, args):
+    freed = db.vacuum()
+    print(f"Freed {freed / 1024 / 1024:.1f} MiB", file=sys.stderr)
+
+def cmd_stats(db, args):
+    stats = db.stats()
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return
+    for name, value in stats.items():
+        if isinstance(value, dict):
+            for key, count in value.items():
+                print(f"{name}.{key}\t{count}")
+        else:
+            print(f"{name}\t{value}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="note_app", description=__doc__.splitlines()[0])
+    parser.add_argument("--db", help="database file (default: the app's)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("list", help="list notes, newest first")
+    command.add_argument("--category", type=parse_category)
+    command.add_argument("--limit", type=int)
+    command.add_argument("--tag", action="append", help="only notes with this tag, repeatable")
+    command.add_argument("--any-tag", action="store_true", help="any of the --tag tags instead of all")
+    command.set_defaults(handler=cmd_list)
+
+    command = commands.add_parser("tags", help="tags with their note counts, most used first")
+    command.add_argument("--category", type=parse_category)
+    command.set_defaults(handler=cmd_tags)
+
+    command = commands.add_parser("search", help="full-text search, best match first")
+    command.add_argument("query")
+    command.add_argument("--category", type=parse_category)
+    command.add_argument("--limit", type=int)
+    command.set_defaults(handler=cmd_search)
+
+    command = commands.add_parser("create", help="create a note, content from --file or stdin")
+    command.add_argument("title")
+    command.add_argument("--file")
+    command.add_argument("--category", type=parse_category)
+    command.add_argument("--tags", default="")
+    command.set_defaults(handler=cmd_create)
+
+    command = commands.add_parser("import", help="import a Markdown directory or JSONL archive")
+    command.add_argument("source")
+    command.add_argument("--batch-size", type=int, default=500)
+    command.add_argument("--workers", type=int)
+    command.set_defaults(handler=cmd_import)
+
+    command = commands.add_parser("export", help="export to a directory, .zip or .jsonl")
+    command.add_argument("output")
+    command.add_argument("--format", choices=("markdown", "html", "both"), default="markdown")
+    command.add_argument("--category", type=parse_category)
+    command.add_argument("--incremental", action="store_true")
+    command.add_argument("--workers", type=int)
+    command.set_defaults(handler=cmd_export)
+
+    command = commands.add_parser("vacuum", help="compact the database file")
+    command.set_defaults(handler=cmd_vacuum)
+
+    command = commands.add_parser("stats", help="note counts and storage use")
+    command.add_argument("--json", action="store_true")
+    command.set_defaults(handler=cmd_stats)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    db = Database(db_file=args.db, compression="zlib")
+    try:
+        return args.handler(db, args) or 0
+    except BrokenPipeError:
+        # Output piped into head or similar, which stopped reading
+        return 0
+    finally:
+        db.close()
+
+if __name__ == '__main__':
+    sys.exit(main())
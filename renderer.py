@@ -0,0 +1,256 @@
+from collections import OrderedDict
+import hashlib
+import os
+import re
+import threading
+
+from disk_cache import prune_cache_dir
+
+EXTENSIONS = [
+    'markdown.extensions.extra',
+    'markdown.extensions.codehilite',
+    'markdown.extensions.tables',
+    'markdown.extensions.toc',
+    'markdown.extensions.nl2br',
+    'markdown.extensions.sane_lists',
+    'markdown.extensions.meta',
+    'markdown.extensions.footnotes',
+]
+# Metadata is only read at the start of a document, blocks after the first
+# are rendered without it so lines such as "Note: ..." stay text
+BODY_EXTENSIONS = [name for name in EXTENSIONS if name != 'markdown.extensions.meta']
+EXTENSION_CONFIGS = {
+    'markdown.extensions.codehilite': {'css_class': 'highlight'},
+    'markdown.extensions.toc': {'permalink': True},
+}
+
+_FENCE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_LIST_ITEM = re.compile(r'^ {0,3}([*+-]|\d+[.)])\s')
+_QUOTE = re.compile(r'^ {0,3}>')
+# Constructs that make one block's output depend on the rest of the document
+# (reference links, footnotes, abbreviations, [TOC] markers, raw HTML blocks,
+# which may span blank lines)
+_DOCUMENT_SCOPED = re.compile(
+    r'^ {0,3}\*?\[[^\]]+\]:|\[\^[^\]]+\]|^\[TOC\]\s*$|^ {0,3}<(?:[A-Za-z/!?])', re.M)
+_ID = re.compile(r'\sid="([^"]*)"')
+
+_render_configs = {}
+
+def create_markdown(extensions=EXTENSIONS):
+    # Imported on first use, Markdown and its extensions are slow to load
+    import markdown
+    return markdown.Markdown(extensions=extensions, extension_configs=EXTENSION_CONFIGS)
+
+def render_config(extensions=EXTENSIONS):
+    """Part of every render cache key, so HTML rendered with another
+    configuration or library version is never served."""
+    key = tuple(extensions)
+    config = _render_configs.get(key)
+    if config is None:
+        import markdown
+        import pygments
+        config = _render_configs[key] = repr((
+            markdown.__version__, pygments.__version__, extensions, sorted(EXTENSION_CONFIGS.items())
+        )).encode()
+    return config
+
+def split_blocks(text):
+    """Split Markdown source into top-level blocks that render independently.
+
+    Blocks are separated by blank lines. Fenced code, indented continuation
+    lines, consecutive list items and quoted lines stay in the block they
+    belong to.
+    """
+    blocks = []
+    current = []
+    blank_lines = 0
+    fence = None
+
+    for line in text.split('\n'):
+        if fence:
+            current.append(line)
+            match = _FENCE.match(line)
+            if match and match.group(1)[0] == fence[0] and len(match.group(1)) >= len(fence):
+                fence = None
+            continue
+
+        if not line.strip():
+            if current:
+                blank_lines += 1
+            continue
+
+        if blank_lines:
+            continues_block = (
+                line[0] in ' \t' or
+                (_LIST_ITEM.match(line) and _LIST_ITEM.match(current[0])) or
+                (_QUOTE.match(line) and _QUOTE.match(current[0]))
+            )
+            if continues_block:
+                current.extend([''] * blank_lines)
+            else:
+                blocks.append('\n'.join(current))
+                current = []
+            blank_lines = 0
+
+        current.append(line)
+        match = _FENCE.match(line)
+        if match:
+            fence = match.group(1)
+
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+class RenderCache:
+    """Rendered HTML of Markdown text, keyed by a hash of the text.
+
+    Entries live in a size-bounded in-memory LRU. With a cache_dir, whole
+    documents are also kept on disk and survive restarts. The disk tier is
+    pruned to max_disk_bytes and max_disk_age seconds on creation and by
+    prune(). Safe to share between threads.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=32 * 1024 * 1024, max_disk_bytes=128 * 1024 * 1024,
+                 max_disk_age=30 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_disk_age = max_disk_age
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.prune()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        # Used by render(), created on first use
+        self._md = None
+        self._md_lock = threading.Lock()
+
+    def render(self, text):
+        """HTML of the Markdown document text."""
+        return self.get(text, self._convert)
+
+    def get(self, text, convert, persist=True, extensions=EXTENSIONS):
+        """HTML of text, calling convert(text) on a miss.
+
+        persist=False keeps the entry out of the disk tier, for preview
+        renders of text that is still being edited. extensions are the ones convert
+        renders with.
+        """
+        key = hashlib.blake2b(render_config(extensions) + text.encode(), digest_size=16).hexdigest()
+        with self._lock:
+            html = self._memory.get(key)
+            if html is not None:
+                self._memory.move_to_end(key)
+                return html
+        if persist:
+            html = self._read(key)
+        if html is None:
+            html = convert(text)
+            if persist:
+                self._write(key, html)
+        self._remember(key, html)
+        return html
+
+    def _convert(self, text):
+        with self._md_lock:
+            if self._md is None:
+                self._md = create_markdown()
+            self._md.reset()
+            return self._md.convert(text)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.html')
+
+    def _read(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                html = f.read()
+            # The modification time is the last use, prune() drops the oldest
+            os.utime(path)
+            return html
+        except OSError:
+            return None
+
+    def _write(self, key, html):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        # Unique temporary name, two threads may render the same text
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(html)
+        os.replace(tmp, path)
+
+    def prune(self):
+        """Trim the disk tier with prune_cache_dir(), return the number of files deleted."""
+        if not self.cache_dir:
+            return 0
+        return prune_cache_dir(self.cache_dir, self.max_disk_bytes, self.max_disk_age)
+
+    def _remember(self, key, html):
+        with self._lock:
+            if key in self._memory:
+                return
+            self._memory[key] = html
+            self._memory_bytes += len(html)
+            while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+class BlockRenderer:
+    """Markdown to HTML conversion that reuses the output of unchanged blocks.
+
+    render_blocks() returns (source, html) pairs for the top-level blocks of
+    a document. Only blocks that were not part of the previous call are
+    converted again, and those go through cache, a RenderCache, when set.
+    Documents whose blocks depend on each other, through document-scoped
+    constructs or ids that the whole document would number apart (two
+    "Setup" headings become setup and setup_1), are rendered as one block.
+    """
+
+    def __init__(self, cache=None):
+        self._md = {}
+        self.cache = cache
+        self._cache = {}
+
+    def convert(self, text, extensions=EXTENSIONS):
+        md = self._md.get(tuple(extensions))
+        if md is None:
+            md = self._md[tuple(extensions)] = create_markdown(extensions)
+        md.reset()
+        return md.convert(text)
+
+    def _render(self, text, extensions=EXTENSIONS):
+        # Preview text changes with every edit, only exports reach the disk tier
+        if self.cache is None:
+            return self.convert(text, extensions)
+        return self.cache.get(text, lambda text: self.convert(text, extensions), False, extensions)
+
+    def _render_document(self, text):
+        self._cache = {}
+        return [(text, self._render(text))] if text.strip() else []
+
+    def render_blocks(self, text):
+        if _DOCUMENT_SCOPED.search(text):
+            return self._render_document(text)
+
+        cache = {}
+        blocks = []
+        ids = set()
+        for index, source in enumerate(split_blocks(text)):
+            key = (index == 0, source)
+            rendered = cache.get(key, self._cache.get(key))
+            if rendered is None:
+                html = self._render(source, EXTENSIONS if index == 0 else BODY_EXTENSIONS)
+                rendered = (html, _ID.findall(html))
+            if not ids.isdisjoint(rendered[1]):
+                return self._render_document(text)
+            ids.update(rendered[1])
+            cache[key] = rendered
+            blocks.append((source, rendered[0]))
+        self._cache = cache
+        return blocks
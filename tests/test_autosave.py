@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from autosave import EditJournal, WriteBehindQueue
+from database import Database
+
+def test_edits_journaled_on_submit(tmp_path):
+    db = Database(db_file=str(tmp_path / "notes.db"))
+    journal = EditJournal(str(tmp_path / "journal.jsonl"))
+    queue = WriteBehindQueue(db, journal)
+    note = db.create_note("Draft", "first")
+    try:
+        # Holding the write lock keeps the queue from committing the edit
+        with db._write_lock:
+            queue.submit(note.id, content="second")
+            assert journal.pending() == {note.id: {'content': "second"}}
+        queue.flush()
+        assert db.get_note(note.id).content == "second"
+        assert journal.pending() == {}
+    finally:
+        queue.stop()
+        db.close()
@@ -0,0 +1,23 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_export import export_notes
+from database import Database
+
+def test_incremental_export_restores_deleted_files(tmp_path):
+    db = Database(db_file=str(tmp_path / "notes.db"))
+    db.create_note("Ribbons", "text")
+    output = str(tmp_path / "export")
+    try:
+        export_notes(db, output, workers=1)
+        exported = [os.path.join(directory, name) for directory, _, names in os.walk(output)
+                    for name in names if name.endswith(".md")]
+        os.remove(exported[0])
+        report = export_notes(db, output, incremental=True, workers=1)
+        assert (report.exported, report.unchanged) == (1, 0)
+        assert os.path.exists(exported[0])
+        assert export_notes(db, output, incremental=True, workers=1).unchanged == 1
+    finally:
+        db.close()
@@ -0,0 +1,32 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bulk_export import export_notes
+from bulk_import import bulk_import, note_from_fields
+from database import Database, attachment_uri
+
+def test_unreadable_date_kept_in_metadata():
+    note = note_from_fields({'date': 'Jan 5 2021', 'updated': '{{date}}'}, "Body", "Untitled")
+    assert note['created_at'] is None
+    assert note['updated_at'] is None
+    assert note['metadata'] == {'date': 'Jan 5 2021', 'updated': '{{date}}'}
+
+def test_archive_round_trip_keeps_attachments(tmp_path):
+    source = Database(db_file=str(tmp_path / "source.db"))
+    image = bytes(range(256)) * 40
+    content = f"Diagram\n\n![diagram]({attachment_uri(source.add_attachment(image, 'image/png'))})"
+    source.create_note("Diagram", content)
+    archive = str(tmp_path / "notes.jsonl")
+    export_notes(source, archive, workers=1)
+    source.close()
+
+    target = Database(db_file=str(tmp_path / "target.db"))
+    try:
+        assert bulk_import(target, archive, workers=1).imported == 1
+        assert target.get_all_notes()[0].content == content
+        with target.engine.connect() as conn:
+            assert conn.exec_driver_sql("SELECT count(*) FROM attachments").scalar() == 1
+    finally:
+        target.close()
@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database, NoteCategory, attachment_uri
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(db_file=str(tmp_path / "notes.db"), compression="zlib", compression_threshold=16)
+    yield db
+    db.close()
+
+def test_attachment_data_loaded(db):
+    attachment_hash = db.add_attachment(b"\x89PNG image bytes", "image/png")
+    assert db.get_attachment(attachment_hash).data == b"\x89PNG image bytes"
+    resolved = db.resolve_attachments(f"![image]({attachment_uri(attachment_hash)})")
+    assert resolved.startswith("![image](data:image/png;base64,")
+
+def test_listed_notes_have_content(db):
+    content = "Typewriter ribbons " * 10
+    db.create_note("Ribbons", content, tags="supplies")
+    assert db.get_all_notes()[0].to_dict()['content'] == content
+    assert db.search_notes("ribbons")[0].to_dict()['content'] == content
+
+def test_compression_is_per_database(tmp_path):
+    compressed = Database(db_file=str(tmp_path / "compressed.db"), compression="lzma", compression_threshold=16)
+    plain = Database(db_file=str(tmp_path / "plain.db"))
+    content = "Typewriter ribbons " * 10
+    try:
+        for db in (compressed, plain):
+            db.create_note("Ribbons", content)
+        stored = []
+        for db in (compressed, plain):
+            with db.engine.connect() as conn:
+                stored.append(conn.exec_driver_sql("SELECT content FROM notes").scalar())
+        assert stored[0][:1] == b"X"
+        assert stored[1] == content
+        assert compressed.get_all_notes()[0].content == content
+    finally:
+        compressed.close()
+        plain.close()
+
+def test_first_update_keeps_text_without_revisions(db):
+    note = db.create_note("Ribbons", "original text")
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM note_revisions")
+    db.update_note(note.id, content="new text")
+    assert [db.get_revision_content(note.id, revision.revision) for revision in db.get_revisions(note.id)] == [
+        "original text", "new text"]
+
+def test_update_without_change_publishes_nothing(db):
+    note = db.create_note("Ribbons", "text", category=NoteCategory.WORK)
+    events = []
+    db.subscribe(events.append)
+    db.update_note(note.id, title="Ribbons", category=NoteCategory.WORK, content="text")
+    assert events == []
+    db.update_note(note.id, title="Spools")
+    assert [event.summary.title for event in events] == ["Spools"]
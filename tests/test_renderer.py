@@ -0,0 +1,43 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from renderer import BlockRenderer, RenderCache, create_markdown
+
+def rendered(text):
+    return "\n".join(html for _, html in BlockRenderer().render_blocks(text))
+
+def test_later_blocks_are_not_metadata():
+    text = "Title: Groceries\n\nMilk\n\nNote: remember the eggs\n\nTODO: fix this"
+    html = rendered(text)
+    assert "Note: remember the eggs" in html
+    assert "TODO: fix this" in html
+    assert "Groceries" not in html
+
+def test_duplicate_headings_numbered_as_in_document():
+    text = "# Setup\n\nFirst\n\n# Setup\n\nSecond"
+    assert rendered(text) == create_markdown().convert(text)
+    assert 'id="setup_1"' in rendered(text)
+
+def test_preview_renders_stay_off_disk(tmp_path):
+    cache = RenderCache(cache_dir=str(tmp_path))
+    BlockRenderer(cache).render_blocks("Text[^1]\n\n[^1]: A footnote")
+    assert os.listdir(tmp_path) == []
+    cache.render("# Exported")
+    assert len(os.listdir(tmp_path)) == 1
+
+def test_disk_tier_pruned(tmp_path):
+    cache = RenderCache(cache_dir=str(tmp_path), max_disk_bytes=1024)
+    for index in range(20):
+        cache.render(f"# Note {index}\n\n" + "text " * 50)
+    assert cache.prune() > 0
+    assert sum(entry.stat().st_size for entry in os.scandir(tmp_path)) <= 1024
+    old = os.path.join(tmp_path, os.listdir(tmp_path)[0])
+    os.utime(old, (0, 0))
+    RenderCache(cache_dir=str(tmp_path), max_disk_bytes=1024)
+    assert not os.path.exists(old)
+
+def test_blocks_spanning_blank_lines_match_document():
+    for text in ("> a\n\n> b", "<div>\n\nx\n\n</div>", "Intro\n\n> a\n\n> b\n\nOutro"):
+        assert rendered(text) == create_markdown().convert(text)
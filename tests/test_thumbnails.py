@@ -0,0 +1,14 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from thumbnails import ThumbnailCache
+
+def test_disk_cache_pruned_on_creation(tmp_path):
+    cache = ThumbnailCache(None, cache_dir=str(tmp_path), max_disk_bytes=2048)
+    for index in range(4):
+        cache._write(f"{index:064x}", 320, bytes(1024))
+    os.utime(cache._path(f"{0:064x}", 320), (0, 0))
+    ThumbnailCache(None, cache_dir=str(tmp_path), max_disk_bytes=2048)
+    assert sorted(os.listdir(tmp_path)) == [f"{index:064x}_320" for index in (2, 3)]
@@ -0,0 +1,132 @@
+from collections import OrderedDict
+from io import BytesIO
+import os
+
+from disk_cache import prune_cache_dir
+
+# Widths thumbnails are generated for. The preview picks the smallest one
+# that still fills its viewport, so every image has at most this many sizes.
+THUMBNAIL_WIDTHS = (320, 640, 960, 1280, 1920)
+
+def bucket_width(width):
+    for bucket in THUMBNAIL_WIDTHS:
+        if bucket >= width:
+            return bucket
+    return THUMBNAIL_WIDTHS[-1]
+
+def make_thumbnail(data, width):
+    """Return data scaled down to width pixels, or None if it is not wider."""
+    # Pillow is imported on first use, it is not needed to start the app
+    from PIL import Image, ImageOps
+    image = Image.open(BytesIO(data))
+    if image.width <= width:
+        return None
+    # JPEG can decode straight at a reduced scale, much cheaper than full size
+    image.draft('RGB', (width, image.height * width // image.width))
+    return encode_image(scale_image(ImageOps.exif_transpose(image), width))
+
+def scale_image(image, width):
+    from PIL import Image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+def encode_image(image):
+    output = BytesIO()
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image.save(output, format='PNG', optimize=True)
+    else:
+        image.convert('RGB').save(output, format='JPEG', quality=85)
+    return output.getvalue()
+
+class ThumbnailCache:
+    """Width-bucketed thumbnails of image attachments.
+
+    Thumbnails are kept in a size-bounded in-memory LRU in front of an
+    on-disk cache, and generated from the attachment store when missing.
+    The disk cache is pruned to max_disk_bytes and max_disk_age seconds on
+    creation and by prune().
+    """
+
+    def __init__(self, store, cache_dir=None, max_bytes=64 * 1024 * 1024,
+                 max_disk_bytes=256 * 1024 * 1024, max_disk_age=30 * 24 * 3600):
+        self.store = store
+        self.cache_dir = cache_dir or os.path.join(
+            os.path.expanduser("~"), ".note_typewriter", "thumbnails")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.max_disk_age = max_disk_age
+        self.prune()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+
+    def generate(self, attachment_hash, data):
+        """Create the thumbnails of every bucket narrower than the image."""
+        from PIL import Image, ImageOps
+        image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+        # Largest first, each bucket is scaled from the previous one
+        for width in reversed(THUMBNAIL_WIDTHS):
+            if image.width > width:
+                image = scale_image(image, width)
+                self._write(attachment_hash, width, encode_image(image))
+
+    def get(self, attachment_hash, width):
+        """Image data to display attachment_hash at width pixels, or None.
+
+        Falls back to the original data when the image is not wider than
+        the matching bucket.
+        """
+        key = (attachment_hash, bucket_width(width))
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            return data
+
+        data = self._read(*key)
+        if data is None:
+            attachment = self.store.get_attachment(attachment_hash)
+            if attachment is None:
+                return None
+            try:
+                data = make_thumbnail(attachment.data, key[1])
+            except OSError:
+                # Not an image Pillow can read, let the caller try the original
+                data = None
+            if data is None:
+                data = attachment.data
+            else:
+                self._write(*key, data)
+
+        self._remember(key, data)
+        return data
+
+    def _path(self, attachment_hash, width):
+        return os.path.join(self.cache_dir, f"{attachment_hash}_{width}")
+
+    def prune(self):
+        """Trim the disk cache, return the number of thumbnails deleted."""
+        return prune_cache_dir(self.cache_dir, self.max_disk_bytes, self.max_disk_age)
+
+    def _read(self, attachment_hash, width):
+        path = self._path(attachment_hash, width)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # The modification time is the last use, prune() drops the oldest
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write(self, attachment_hash, width, data):
+        path = self._path(attachment_hash, width)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(data)
+        os.replace(path + '.tmp', path)
+
+    def _remember(self, key, data):
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
@@ -1,27 +1,92 @@
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QSplitter,
-                             QTextEdit, QToolButton, QFileDialog, QMenu,
-                             QDialog, QLabel, QPushButton)
-from PySide6.QtCore import Qt, Signal, QMimeData, QUrl
-from PySide6.QtGui import (QTextCharFormat, QImage, QTextCursor,
-                        QDropEvent, QDragEnterEvent, QPainter, QColor)
-import markdown
-from markdown.extensions import fenced_code
-from markdown.extensions.tables import TableExtension
-from markdown.extensions.toc import TocExtension
-from markdown.extensions.codehilite import CodeHiliteExtension
-from markdown.extensions.nl2br import Nl2BrExtension
-from markdown.extensions.sane_lists import SaneListExtension
+from PySide6.QtWidgets import QWidget, QHBoxLayout, QSplitter, QTextEdit, QFileDialog
+from PySide6.QtCore import Qt, Signal
+from PySide6.QtGui import (QTextCharFormat, QImage, QTextCursor, QTextFrameFormat,
+                        QTextBlockFormat, QTextDocument, QDropEvent, QDragEnterEvent)
+from renderer import BlockRenderer
+from thumbnails import ThumbnailCache
+from .workers import PreviewScheduler
 import os
-from datetime import datetime
-from pygments import highlight
-from pygments.formatters import HtmlFormatter
-from pygments.lexers import get_lexer_by_name
+import mimetypes
+import zlib
 import base64
-from PIL import Image
-from io import BytesIO
+
+PREVIEW_CSS = """
+    body {
+        font-family: 'SF Pro Text', 'Segoe UI', Arial, sans-serif;
+        line-height: 1.6;
+        color: #ffffff;
+        background-color: #141414;
+    }
+    h1, h2, h3, h4, h5, h6 {
+        color: #ff69b4;
+        border-bottom: 1px solid #2d2d2d;
+        padding-bottom: 5px;
+    }
+    code {
+        background-color: #1f1f1f;
+        padding: 2px 4px;
+        border-radius: 4px;
+        font-family: 'Consolas', monospace;
+    }
+    pre {
+        background-color: #1f1f1f;
+        padding: 15px;
+        border-radius: 8px;
+        overflow-x: auto;
+    }
+    blockquote {
+        border-left: 4px solid #ff69b4;
+        margin: 0;
+        padding-left: 15px;
+        color: #e0e0e0;
+    }
+    table {
+        border-collapse: collapse;
+        width: 100%;
+        margin: 15px 0;
+    }
+    th, td {
+        border: 1px solid #2d2d2d;
+        padding: 8px;
+        text-align: left;
+    }
+    th {
+        background-color: #1f1f1f;
+        color: #ff69b4;
+    }
+    img {
+        max-width: 100%;
+        border-radius: 8px;
+    }
+"""
+
+# Minimum time between two background preview renders
+PREVIEW_MIN_INTERVAL_MS = 100
+
+def group_blocks(blocks, average_size=8):
+    """Merge rendered blocks into chunks of about average_size blocks.
+
+    Chunks end after blocks whose checksum is a multiple of average_size, so
+    boundaries depend on content rather than position and an edit only ever
+    changes the chunk it falls into. Keeps the number of QTextFrames, which
+    are expensive to lay out, well below the number of blocks.
+    """
+    chunks = []
+    sources = []
+    htmls = []
+    for source, html in blocks:
+        sources.append(source)
+        htmls.append(html)
+        if zlib.crc32(source.encode()) % average_size == 0:
+            chunks.append(("\n\n".join(sources), "\n".join(htmls)))
+            sources = []
+            htmls = []
+    if sources:
+        chunks.append(("\n\n".join(sources), "\n".join(htmls)))
+    return chunks
 
 class MarkdownPreview(QTextEdit):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, min_interval_ms=PREVIEW_MIN_INTERVAL_MS):
         super().__init__(parent)
         self.setReadOnly(True)
         self.setStyleSheet("""
@@ -33,90 +98,140 @@ class MarkdownPreview(QTextEdit):
             }
         """)
         
-        # Setup Markdown extensions
-        self.md = markdown.Markdown(extensions=[
-            'markdown.extensions.extra',
-            'markdown.extensions.codehilite',
-            'markdown.extensions.tables',
-            'markdown.extensions.toc',
-            'markdown.extensions.nl2br',
-            'markdown.extensions.sane_lists',
-            'markdown.extensions.meta',
-            'markdown.extensions.footnotes',
-            CodeHiliteExtension(css_class='highlight'),
-            TableExtension(),
-            TocExtension(permalink=True)
-        ])
-        
-        # Add CSS for syntax highlighting
-        self.css = HtmlFormatter().get_style_defs('.highlight')
+        self.renderer = BlockRenderer()
+        # Stylesheet is applied once to the document, on the first update
+        self.css = None
+        self.document().setUndoRedoEnabled(False)
         
-    def update_preview(self, text):
-        # Convert Markdown to HTML
-        html = self.md.convert(text)
+        # Source of each rendered chunk, in the same order as the frames
+        # holding its HTML in the document
+        self.chunk_sources = []
         
-        # Add custom CSS
-        styled_html = f"""
-        <style>
-            body {{
-                font-family: 'SF Pro Text', 'Segoe UI', Arial, sans-serif;
-                line-height: 1.6;
-                color: #ffffff;
-                background-color: #141414;
-            }}
-            h1, h2, h3, h4, h5, h6 {{
-                color: #ff69b4;
-                border-bottom: 1px solid #2d2d2d;
-                padding-bottom: 5px;
-            }}
-            code {{
-                background-color: #1f1f1f;
-                padding: 2px 4px;
-                border-radius: 4px;
-                font-family: 'Consolas', monospace;
-            }}
-            pre {{
-                background-color: #1f1f1f;
-                padding: 15px;
-                border-radius: 8px;
-                overflow-x: auto;
-            }}
-            blockquote {{
-                border-left: 4px solid #ff69b4;
-                margin: 0;
-                padding-left: 15px;
-                color: #e0e0e0;
-            }}
-            table {{
-                border-collapse: collapse;
-                width: 100%;
-                margin: 15px 0;
-            }}
-            th, td {{
-                border: 1px solid #2d2d2d;
-                padding: 8px;
-                text-align: left;
-            }}
-            th {{
-                background-color: #1f1f1f;
-                color: #ff69b4;
-            }}
-            img {{
-                max-width: 100%;
-                border-radius: 8px;
-            }}
-            {self.css}
-        </style>
-        {html}
+        # Markdown conversion for live updates runs off the GUI thread
+        self.scheduler = PreviewScheduler(min_interval_ms, self)
+        self.scheduler.rendered.connect(self.show_rendered)
+        
+        # Resolves attachment: image URIs, see EnhancedEditor.set_attachment_store()
+        self.thumbnails = None
+        
+    def loadResource(self, resource_type, url):
+        if resource_type == QTextDocument.ImageResource and self.thumbnails:
+            image = self.load_attachment(url)
+            if image is not None:
+                return image
+        return super().loadResource(resource_type, url)
+    
+    def load_attachment(self, url):
+        # thumbnails is set once the database layer is loaded, so this import is free
+        from database import ATTACHMENT_SCHEME
+        if url.scheme() != ATTACHMENT_SCHEME:
+            return None
+        # Load a copy scaled for the viewport, not the full-size original
+        width = int(self.viewport().width() * self.devicePixelRatioF())
+        data = self.thumbnails.get(url.path(), width)
+        if data is None:
+            return None
+        image = QImage.fromData(data)
+        image.setDevicePixelRatio(self.devicePixelRatioF())
+        return image
+    
+    def update_preview(self, text):
+        self.show_rendered(text, self.renderer.render_blocks(text))
+    
+    def show_rendered(self, text, blocks):
+        self.apply_blocks(blocks)
+    
+    def set_render_cache(self, cache):
+        """Share cache, a RenderCache, with exports and between notes."""
+        self.renderer.cache = cache
+        self.scheduler.set_render_cache(cache)
+    
+    def request_update(self, text):
+        """Render text in the background, the preview updates when it is done."""
+        self.scheduler.submit(text)
+    
+    def stop_rendering(self):
+        self.scheduler.stop()
+    
+    def apply_blocks(self, blocks):
+        """Patch the document so it shows blocks, a list of (source, html).
+
+        Consecutive blocks are grouped into chunks and each chunk lives in its
+        own frame. Frames of unchanged leading and trailing chunks are kept,
+        only the ones in between are replaced.
         """
-        self.setHtml(styled_html)
+        if self.css is None:
+            # Pygments is imported on first use, not while the window is built
+            from pygments.formatters import HtmlFormatter
+            self.css = HtmlFormatter().get_style_defs('.highlight')
+            self.document().setDefaultStyleSheet(PREVIEW_CSS + self.css)
+        chunks = group_blocks(blocks)
+        sources = [source for source, _ in chunks]
+        old = self.chunk_sources
+        
+        prefix = 0
+        while prefix < min(len(old), len(sources)) and old[prefix] == sources[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < min(len(old), len(sources)) - prefix and
+               old[-1 - suffix] == sources[-1 - suffix]):
+            suffix += 1
+        if prefix == len(old) == len(sources):
+            return
+        
+        scroll_bar = self.verticalScrollBar()
+        scroll_value = scroll_bar.value()
+        
+        document = self.document()
+        frames = document.rootFrame().childFrames()
+        cursor = QTextCursor(document)
+        cursor.beginEditBlock()
+        
+        for frame in frames[prefix:len(old) - suffix]:
+            cursor.setPosition(frame.firstPosition() - 1)
+            cursor.setPosition(frame.lastPosition() + 1, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+        
+        if prefix:
+            position = frames[prefix - 1].lastPosition() + 1
+        else:
+            position = document.rootFrame().firstPosition()
+        for _, html in chunks[prefix:len(sources) - suffix]:
+            cursor.setPosition(position)
+            frame = cursor.insertFrame(QTextFrameFormat())
+            cursor.insertHtml(html)
+            self._collapse_block(cursor, frame.firstPosition() - 1)
+            self._collapse_block(cursor, frame.lastPosition() + 1)
+            position = frame.lastPosition() + 1
+        
+        cursor.endEditBlock()
+        self.chunk_sources = sources
+        scroll_bar.setValue(scroll_value)
+    
+    def _collapse_block(self, cursor, position):
+        # Hide the empty paragraph QTextDocument keeps between two frames
+        cursor.setPosition(position)
+        block_fmt = QTextBlockFormat()
+        block_fmt.setLineHeight(0, 2)  # type 2 = FixedHeight
+        char_fmt = QTextCharFormat()
+        char_fmt.setFontPointSize(1)
+        cursor.setBlockFormat(block_fmt)
+        cursor.setBlockCharFormat(char_fmt)
 
 class EnhancedEditor(QWidget):
     content_changed = Signal()
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.attachment_store = None
+        self.thumbnails = None
         self.setup_ui()
+    
+    def set_attachment_store(self, store):
+        """Use store (a Database) to save inserted images and load them in the preview."""
+        self.attachment_store = store
+        self.thumbnails = ThumbnailCache(store)
+        self.preview.thumbnails = self.thumbnails
         
     def setup_ui(self):
         layout = QHBoxLayout(self)
@@ -162,13 +277,13 @@ class EnhancedEditor(QWidget):
     def handle_content_changed(self):
         self.content_changed.emit()
         if not self.preview.isHidden():
-            self.preview.update_preview(self.editor.toPlainText())
+            self.preview.request_update(self.editor.toPlainText())
     
     def toggle_preview(self, preview_type="split"):
         if preview_type == "split":
             if self.preview.isHidden():
                 self.preview.show()
-                self.preview.update_preview(self.editor.toPlainText())
+                self.preview.request_update(self.editor.toPlainText())
                 self.splitter.setSizes([self.width() // 2, self.width() // 2])
             else:
                 self.preview.hide()
@@ -177,7 +292,7 @@ class EnhancedEditor(QWidget):
             if self.preview.isHidden():
                 self.editor.hide()
                 self.preview.show()
-                self.preview.update_preview(self.editor.toPlainText())
+                self.preview.request_update(self.editor.toPlainText())
             else:
                 self.preview.hide()
                 self.editor.show()
@@ -190,14 +305,26 @@ class EnhancedEditor(QWidget):
             )
         
         if image_path:
-            # Convert image to base64
             with open(image_path, 'rb') as img_file:
-                img_data = base64.b64encode(img_file.read()).decode()
+                img_data = img_file.read()
+            
+            if self.attachment_store:
+                from database import attachment_uri
+                # Keep the bytes out of the note text, reference them by hash
+                mime_type = mimetypes.guess_type(image_path)[0] or "image/png"
+                attachment_hash = self.attachment_store.add_attachment(img_data, mime_type)
+                try:
+                    self.thumbnails.generate(attachment_hash, img_data)
+                except OSError:
+                    pass  # Not decodable by Pillow, the preview shows the original
+                image_url = attachment_uri(attachment_hash)
+            else:
+                image_url = f"data:image/png;base64,{base64.b64encode(img_data).decode()}"
             
             # Insert markdown image
             cursor = self.editor.textCursor()
             image_name = os.path.basename(image_path)
-            cursor.insertText(f"\n![{image_name}](data:image/png;base64,{img_data})\n")
+            cursor.insertText(f"\n![{image_name}]({image_url})\n")
     
     def insert_table(self, rows=3, cols=3):
         # Create markdown table
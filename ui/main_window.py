@@ -1,18 +1,22 @@
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QPushButton, QListWidget, QTextEdit, QLineEdit,
-                             QSplitter, QLabel, QListWidgetItem, QToolBar,
+                             QPushButton, QListView, QTextEdit, QLineEdit,
+                             QSplitter, QLabel, QToolBar,
                              QFontComboBox, QSpinBox, QComboBox, QFrame,
                              QMenu, QToolButton, QMenuBar, QStatusBar)
-from PySide6.QtCore import Qt, Signal, QSize
+from PySide6.QtCore import Qt, Signal, QSize, QTimer
 from PySide6.QtGui import (QIcon, QFont, QKeySequence, QTextCharFormat,
                         QColor, QTextCursor, QAction, QFontDatabase,
                         QTextListFormat, QTextBlockFormat)
 from .styles import *
 from .enhanced_editor import EnhancedEditor
+from .note_list_model import NoteListModel, NOTE_ID_ROLE
 
 # Preset font sizes that match common text editors
 FONT_SIZES = [8, 9, 10, 11, 12, 14, 16, 18, 20, 22, 24, 26, 28, 36, 48, 72]
 
+# Delay after the last keystroke before a search is issued
+SEARCH_DEBOUNCE_MS = 200
+
 class FontSizeComboBox(QComboBox):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -147,17 +151,28 @@ class MainWindow(QMainWindow):
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("🔍 Search notes...")
         self.search_bar.setStyleSheet(SEARCH_BAR_STYLE)
-        self.search_bar.textChanged.connect(self.search_changed.emit)
         self.search_bar.setFixedHeight(28)  # Consistent height
         
+        # Debounce typing so only the final query of a burst is searched
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DEBOUNCE_MS)
+        self.search_timer.timeout.connect(
+            lambda: self.search_changed.emit(self.search_bar.text())
+        )
+        self.search_bar.textChanged.connect(lambda _: self.search_timer.start())
+        
         nav_layout.addWidget(self.category_combo)
         nav_layout.addWidget(self.search_bar)
         
-        # Note list
-        self.note_list = QListWidget()
+        # Note list, rows are paged in from the database as the view scrolls
+        self.note_model = NoteListModel(self)
+        self.note_list = QListView()
+        self.note_list.setModel(self.note_model)
+        self.note_list.setUniformItemSizes(True)
         self.note_list.setStyleSheet(NOTE_LIST_STYLE)
-        self.note_list.itemClicked.connect(
-            lambda item: self.note_selected.emit(item.data(Qt.UserRole))
+        self.note_list.clicked.connect(
+            lambda index: self.note_selected.emit(index.data(NOTE_ID_ROLE))
         )
         
         left_layout.addWidget(nav_toolbar)
@@ -250,8 +265,10 @@ class MainWindow(QMainWindow):
         self.editor = self.editor_widget.editor
         self.preview = self.editor_widget.preview
         
-        # Connect text change handler
-        self.editor.textChanged.connect(self.handle_text_change)
+        # Toolbar follows the format at the cursor, see sync_format_controls()
+        self._format_state = None
+        self.editor.cursorPositionChanged.connect(self.sync_format_controls)
+        self.editor.currentCharFormatChanged.connect(self.sync_format_controls)
         
         # Add widgets to right layout
         right_layout.addWidget(format_toolbar)
@@ -446,36 +463,54 @@ class MainWindow(QMainWindow):
         cursor.createList(list_fmt)
         self.editor.setFocus()
 
-    def handle_text_change(self):
+    def sync_format_controls(self, *args):
+        """Show the format at the cursor in the toolbar.
+
+        Runs when the cursor moves or its format changes, not on every edit.
+        Controls are only touched when the state differs from the last one
+        shown, and the font controls do not signal, so syncing never applies
+        a format back to the text.
+        """
         cursor = self.editor.textCursor()
         fmt = cursor.charFormat()
-        block_fmt = cursor.blockFormat()
+        current_list = cursor.currentList()
+        state = (
+            fmt.fontWeight() == QFont.Bold,
+            fmt.fontItalic(),
+            fmt.fontUnderline(),
+            cursor.blockFormat().alignment(),
+            current_list.format().style() if current_list else None,
+            # Text without a size of its own uses the editor's
+            int(fmt.fontPointSize()) or self.editor.font().pointSize(),
+            fmt.font().family(),
+        )
+        if state == self._format_state:
+            return
+        self._format_state = state
+        bold, italic, underline, alignment, list_style, size, family = state
         
         # Update format buttons state
-        self.btn_bold.setChecked(fmt.fontWeight() == QFont.Bold)
-        self.btn_italic.setChecked(fmt.fontItalic())
-        self.btn_underline.setChecked(fmt.fontUnderline())
+        self.btn_bold.setChecked(bold)
+        self.btn_italic.setChecked(italic)
+        self.btn_underline.setChecked(underline)
         
         # Update alignment buttons
-        alignment = block_fmt.alignment()
-        self.btn_align_left.setChecked(alignment == Qt.AlignLeft)
-        self.btn_align_center.setChecked(alignment == Qt.AlignCenter)
-        self.btn_align_right.setChecked(alignment == Qt.AlignRight)
+        # Flags, AlignCenter also includes vertical centering
+        self.btn_align_left.setChecked(bool(alignment & Qt.AlignLeft))
+        self.btn_align_center.setChecked(bool(alignment & Qt.AlignHCenter))
+        self.btn_align_right.setChecked(bool(alignment & Qt.AlignRight))
         
         # Update list buttons
-        current_list = cursor.currentList()
-        if current_list:
-            list_fmt = current_list.format()
-            self.btn_bullet_list.setChecked(list_fmt.style() == QTextListFormat.ListDisc)
-            self.btn_number_list.setChecked(list_fmt.style() == QTextListFormat.ListDecimal)
-        else:
-            self.btn_bullet_list.setChecked(False)
-            self.btn_number_list.setChecked(False)
+        self.btn_bullet_list.setChecked(list_style == QTextListFormat.ListDisc)
+        self.btn_number_list.setChecked(list_style == QTextListFormat.ListDecimal)
         
         # Update font controls
-        if fmt.fontPointSize() > 0:
-            self.font_size.setValue(int(fmt.fontPointSize()))
+        self.font_size.blockSignals(True)
+        self.font_family.blockSignals(True)
+        self.font_size.setCurrentText(str(size))
         self.font_family.setCurrentFont(fmt.font())
+        self.font_size.blockSignals(False)
+        self.font_family.blockSignals(False)
 
     def format_font(self):
         cursor = self.editor.textCursor()
@@ -532,19 +567,15 @@ class MainWindow(QMainWindow):
         self.font_size.setCurrentText(str(new_size))
         self.format_font_size()
 
-    def refresh_note_list(self, notes):
-        self.note_list.clear()
-        for note in notes:
-            item = QListWidgetItem(f"📝 {note.title}")
-            item.setData(Qt.UserRole, note.id)
-            # Add metadata as tooltip
-            created = note.created_at.strftime("%Y-%m-%d %H:%M")
-            updated = note.updated_at.strftime("%Y-%m-%d %H:%M")
-            item.setToolTip(f"Created: {created}\nLast modified: {updated}")
-            self.note_list.addItem(item)
+    def refresh_note_list(self, fetch_page, first_page=None, ordered_by_recency=True, accept=None):
+        self.note_model.reset(fetch_page, first_page, ordered_by_recency, accept)
     
     def set_note_content(self, title, content, tags, metadata=None):
         self.editor.setText(content)
+        self.set_note_details(tags, metadata)
+    
+    def set_note_details(self, tags, metadata=None):
+        """Tags and dates of the note whose document the editor shows."""
         self.tags_input.setText(tags or "")
         if metadata:
             created = metadata['created_at'].strftime("%Y-%m-%d %H:%M")
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+
+from PySide6.QtGui import QTextDocument, QTextCursor
+
+# Text is inserted this many characters at a time. setPlainText() holds the
+# GIL for the whole note, which stalls the GUI thread while a background
+# thread builds a large document.
+INSERT_CHUNK_SIZE = 16 * 1024
+
+def make_document(content):
+    """Editor document holding content as plain text.
+
+    Safe to call off the GUI thread, the layout is only created once the
+    document is shown.
+    """
+    content = content or ""
+    document = QTextDocument()
+    document.setUndoRedoEnabled(False)
+    cursor = QTextCursor(document)
+    for start in range(0, len(content), INSERT_CHUNK_SIZE):
+        cursor.insertText(content[start:start + INSERT_CHUNK_SIZE])
+    # Re-enabling also starts the undo history from the loaded text
+    document.setUndoRedoEnabled(True)
+    document.setModified(False)
+    return document
+
+class OpenNote:
+    """A note as opened in the editor.
+
+    saved_hashes are the hashes of the note's fields as last read from or
+    written to the database.
+    """
+    __slots__ = ('note', 'document', 'saved_hashes')
+
+    def __init__(self, note, document, saved_hashes):
+        self.note = note
+        self.document = document
+        self.saved_hashes = saved_hashes
+
+class NoteDocumentCache:
+    """Recently opened notes with their editor documents, least recently used evicted first.
+
+    Opening a cached note swaps its document into the editor with
+    setDocument() instead of parsing its content again, and keeps its undo
+    history. Unsaved edits live in the document, so while cached it is the
+    newest version of the note.
+    """
+
+    def __init__(self, editor, capacity=16):
+        self.editor = editor
+        self.capacity = capacity
+        self._notes = OrderedDict()  # note id -> OpenNote
+        # Shown when no note is open
+        self._blank = QTextDocument(editor)
+
+    def __contains__(self, note_id):
+        return note_id in self._notes
+
+    def get(self, note_id):
+        opened = self._notes.get(note_id)
+        if opened is not None:
+            self._notes.move_to_end(note_id)
+        return opened
+
+    def put(self, note, document, saved_hashes):
+        """Cache a note with its document, which the editor now owns."""
+        self.discard(note.id)
+        document.setParent(self.editor)
+        opened = self._notes[note.id] = OpenNote(note, document, saved_hashes)
+        while len(self._notes) > self.capacity:
+            note_id = next(iter(self._notes))
+            if self._notes[note_id].document is self.editor.document():
+                self._notes.move_to_end(note_id)
+                continue
+            self._notes.pop(note_id).document.deleteLater()
+        return opened
+
+    def show(self, opened):
+        document = opened.document
+        if self.editor.document() is document:
+            return
+        # setText() would have applied the editor's font (from its style sheet)
+        if document.defaultFont() != self.editor.font():
+            document.setDefaultFont(self.editor.font())
+        self.editor.setDocument(document)
+
+    def show_blank(self):
+        self._blank.clear()
+        self._blank.setDefaultFont(self.editor.font())
+        self.editor.setDocument(self._blank)
+
+    def discard(self, note_id):
+        opened = self._notes.pop(note_id, None)
+        if opened is None:
+            return
+        if self.editor.document() is opened.document:
+            self.show_blank()
+        opened.document.deleteLater()
+
+    def note_updated(self, summary):
+        """Apply a NoteSummary from a change event to the cached note."""
+        opened = self._notes.get(summary.id)
+        if opened is not None:
+            opened.note.title = summary.title
+            opened.note.category = summary.category
+            opened.note.updated_at = summary.updated_at
@@ -0,0 +1,172 @@
+from PySide6.QtCore import Qt, QAbstractListModel, QModelIndex
+
+NOTE_ID_ROLE = Qt.UserRole
+
+class NoteListModel(QAbstractListModel):
+    """List model over note summaries, fetched from the database in pages.
+
+    Rows are loaded as the view scrolls instead of all at once, and single
+    notes are inserted, updated or removed in place without a reset. When
+    rows are ordered by recency, they are sorted by (updated_at, id)
+    descending and changed notes are placed by binary search.
+    """
+    PAGE_SIZE = 200
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        # Loaded summaries by note id, to find a note's row without a scan
+        self._by_id = {}
+        self._fetch_page = None
+        # Last row of the last page fetched, the next page starts after it
+        self._cursor = None
+        self._exhausted = True
+        self._accept = None
+        # Rows follow updated_at (newest first) rather than search rank
+        self.ordered_by_recency = True
+
+    def reset(self, fetch_page, first_page=None, ordered_by_recency=True, accept=None):
+        """Show a new result set.
+
+        fetch_page(after, limit) returns the summaries that follow after, the
+        last summary fetched so far (None for the first page). first_page
+        can be passed when it has already been loaded elsewhere.
+        accept(summary) tells whether a created or updated note belongs in
+        the list, by default every note does.
+        """
+        if first_page is None:
+            first_page = fetch_page(None, self.PAGE_SIZE)
+        self.beginResetModel()
+        self._fetch_page = fetch_page
+        self._rows = list(first_page)
+        self._cursor = self._rows[-1] if self._rows else None
+        self._by_id = {note.id: note for note in self._rows}
+        self._exhausted = len(self._rows) < self.PAGE_SIZE
+        self._accept = accept
+        self.ordered_by_recency = ordered_by_recency
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        # Rows inserted or moved by change events do not shift the next page
+        rows = self._fetch_page(self._cursor, self.PAGE_SIZE)
+        self._exhausted = len(rows) < self.PAGE_SIZE
+        if rows:
+            self._cursor = rows[-1]
+        # Notes already moved into the loaded rows by a change event
+        rows = [note for note in rows if note.id not in self._by_id]
+        if rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+            self._rows.extend(rows)
+            self._by_id.update((note.id, note) for note in rows)
+            self.endInsertRows()
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        note = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return f"📝 {note.title}"
+        if role == NOTE_ID_ROLE:
+            return note.id
+        if role == Qt.ToolTipRole:
+            # Formatted on demand, only for the row under the mouse
+            created = note.created_at.strftime("%Y-%m-%d %H:%M")
+            updated = note.updated_at.strftime("%Y-%m-%d %H:%M")
+            return f"Created: {created}\nLast modified: {updated}"
+        return None
+
+    def _position(self, note):
+        """First row that sorts after note, by (updated_at, id) descending."""
+        key = (note.updated_at, note.id)
+        low, high = 0, len(self._rows)
+        while low < high:
+            middle = (low + high) // 2
+            row = self._rows[middle]
+            if (row.updated_at, row.id) > key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def row_of(self, note_id):
+        note = self._by_id.get(note_id)
+        if note is None:
+            return -1
+        if self.ordered_by_recency:
+            return self._position(note)
+        return self._rows.index(note)
+
+    def neighbour_ids(self, note_id, distance):
+        """Ids of the loaded notes up to distance rows from note_id, nearest first."""
+        row = self.row_of(note_id)
+        if row < 0:
+            return []
+        rows = [row + step * sign for step in range(1, distance + 1) for sign in (1, -1)]
+        return [self._rows[row].id for row in rows if 0 <= row < len(self._rows)]
+
+    def _accepts(self, summary):
+        return self._accept is None or self._accept(summary)
+
+    def _beyond_cursor(self, summary):
+        # Such notes are left for fetchMore() to load
+        cursor = self._cursor
+        return (not self._exhausted and cursor is not None
+                and (summary.updated_at, summary.id) < (cursor.updated_at, cursor.id))
+
+    def _insert(self, summary):
+        if self._beyond_cursor(summary):
+            return
+        row = self._position(summary)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._rows.insert(row, summary)
+        self._by_id[summary.id] = summary
+        self.endInsertRows()
+
+    def note_created(self, summary):
+        if self.ordered_by_recency and self._accepts(summary):
+            self._insert(summary)
+
+    def note_updated(self, summary):
+        if not self._accepts(summary):
+            self.note_removed(summary.id)
+            return
+        row = self.row_of(summary.id)
+        if row < 0:
+            # Moved into view, for example by becoming the most recent note
+            if self.ordered_by_recency:
+                self._insert(summary)
+            return
+
+        position = row
+        if self.ordered_by_recency:
+            if self._beyond_cursor(summary):
+                self.note_removed(summary.id)
+                return
+            position = self._position(summary)
+        self._rows[row] = summary
+        self._by_id[summary.id] = summary
+        index = self.index(row)
+        self.dataChanged.emit(index, index)
+        # Moved rather than removed and inserted, so the view keeps the selection
+        if position not in (row, row + 1):
+            self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), position)
+            self._rows.insert(position if position < row else position - 1, self._rows.pop(row))
+            self.endMoveRows()
+
+    def note_removed(self, note_id):
+        row = self.row_of(note_id)
+        if row < 0:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self._rows[row]
+        del self._by_id[note_id]
+        self.endRemoveRows()
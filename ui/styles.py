@@ -167,7 +167,7 @@ COMBOBOX_STYLE = f"""
 """
 
 NOTE_LIST_STYLE = f"""
-    QListWidget {{
+    QListView {{
         background-color: {DARKER_BG};
         color: {TEXT};
         border: none;
@@ -175,17 +175,17 @@ NOTE_LIST_STYLE = f"""
         padding: 4px;
         font-size: 13px;
     }}
-    QListWidget::item {{
+    QListView::item {{
         background-color: {LIGHTER_BG};
         border-radius: 6px;
         padding: 8px;
         margin: 2px 4px;
     }}
-    QListWidget::item:selected {{
+    QListView::item:selected {{
         background-color: {PINK};
         color: {DARKER_BG};
     }}
-    QListWidget::item:hover:!selected {{
+    QListView::item:hover:!selected {{
         background-color: {BORDER};
     }}
 """
@@ -0,0 +1,248 @@
+import threading
+
+from PySide6.QtCore import QObject, QThread, QTimer, QElapsedTimer, QCoreApplication, Signal, Slot
+
+from renderer import BlockRenderer
+from .note_documents import make_document
+
+class SignalBridge(QObject):
+    """Delivers calls made on any thread to slots on the GUI thread."""
+    emitted = Signal(object)
+
+class SearchWorker(QObject):
+    results_ready = Signal(int, object)  # generation, notes
+
+    def __init__(self, db, limit=None):
+        super().__init__()
+        self.db = db
+        self.limit = limit
+        self.latest_generation = 0
+        self._lock = threading.Lock()
+        self._active = None  # (generation, DBAPI connection) of the running query
+
+    @Slot(int, str, object)
+    def run_search(self, generation, query, category):
+        # SQLAlchemy is not imported until the window is on screen
+        from sqlalchemy.exc import OperationalError
+
+        # A newer query was queued behind this one, skip straight to it
+        if generation != self.latest_generation:
+            return
+
+        # The read transaction ends with the session, the connection goes back to the pool
+        with self.db.read_session() as session:
+            connection = session.connection().connection.dbapi_connection
+            with self._lock:
+                self._active = (generation, connection)
+            try:
+                notes = self.db.search_note_summaries(query, category=category,
+                                                      session=session, limit=self.limit)
+            except OperationalError:
+                # Interrupted by cancel(), a newer query is on its way
+                return
+            finally:
+                with self._lock:
+                    self._active = None
+
+        if generation == self.latest_generation:
+            self.results_ready.emit(generation, notes)
+
+    def cancel(self):
+        """Abort the running query if it has been superseded. Thread-safe."""
+        with self._lock:
+            if self._active and self._active[0] != self.latest_generation:
+                self._active[1].interrupt()
+
+class SearchController(QObject):
+    """Runs note searches on a background thread.
+
+    Only the most recent query is delivered: queued queries that have been
+    superseded are skipped and a running one is interrupted. At most limit
+    results are fetched, the rest is left for the note list to page in.
+    """
+    results_ready = Signal(str, object, object)  # query, category, notes
+    _search_requested = Signal(int, str, object)
+
+    def __init__(self, db, limit=None, parent=None):
+        super().__init__(parent)
+        self.generation = 0
+        self._request = None
+
+        self.thread = QThread()
+        self.worker = SearchWorker(db, limit)
+        self.worker.moveToThread(self.thread)
+        self._search_requested.connect(self.worker.run_search)
+        self.worker.results_ready.connect(self._deliver)
+        self.thread.start()
+
+    def search(self, query, category=None):
+        self.generation += 1
+        self.worker.latest_generation = self.generation
+        self.worker.cancel()
+        self._request = (query, category)
+        self._search_requested.emit(self.generation, query, category)
+
+    def _deliver(self, generation, notes):
+        # Results can still be in the event queue when a newer search starts
+        if generation == self.generation:
+            query, category = self._request
+            self.results_ready.emit(query, category, notes)
+
+    def cancel(self):
+        """Drop any pending or running search."""
+        self.generation += 1
+        self.worker.latest_generation = self.generation
+        self.worker.cancel()
+
+    def stop(self):
+        self.cancel()
+        self.thread.quit()
+        self.thread.wait()
+
+class PreviewRenderWorker(QObject):
+    rendered = Signal(str, object)  # text, list of (source, html) blocks
+
+    def __init__(self):
+        super().__init__()
+        self.renderer = None
+        self.cache = None
+
+    @Slot(object)
+    def set_cache(self, cache):
+        self.cache = cache
+        if self.renderer is not None:
+            self.renderer.cache = cache
+
+    @Slot(str)
+    def render(self, text):
+        # Markdown instances are not thread-safe, this one is only used here
+        if self.renderer is None:
+            self.renderer = BlockRenderer(self.cache)
+        self.rendered.emit(text, self.renderer.render_blocks(text))
+
+class PreviewScheduler(QObject):
+    """Renders Markdown for the preview on a background thread.
+
+    At most one render is in flight. Text submitted in the meantime replaces
+    any text still waiting, so only the latest version is rendered next.
+    Renders start at least min_interval_ms apart.
+    """
+    rendered = Signal(str, object)
+    _render_requested = Signal(str)
+    _cache_changed = Signal(object)
+
+    def __init__(self, min_interval_ms=100, parent=None):
+        super().__init__(parent)
+        self.min_interval_ms = min_interval_ms
+        self.pending = None
+        self.in_flight = False
+        self.last_start = QElapsedTimer()
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self._dispatch)
+
+        self.thread = QThread()
+        self.worker = PreviewRenderWorker()
+        self.worker.moveToThread(self.thread)
+        self._render_requested.connect(self.worker.render)
+        self._cache_changed.connect(self.worker.set_cache)
+        self.worker.rendered.connect(self._finished)
+        self.thread.start()
+
+    def submit(self, text):
+        self.pending = text
+        self._schedule()
+
+    def set_render_cache(self, cache):
+        # Applied on the worker thread, in order with the renders
+        self._cache_changed.emit(cache)
+
+    def _schedule(self):
+        if self.in_flight or self.pending is None or self.timer.isActive():
+            return
+        elapsed = self.last_start.elapsed() if self.last_start.isValid() else self.min_interval_ms
+        self.timer.start(max(0, self.min_interval_ms - elapsed))
+
+    def _dispatch(self):
+        if self.in_flight or self.pending is None:
+            return
+        text, self.pending = self.pending, None
+        self.in_flight = True
+        self.last_start.start()
+        self._render_requested.emit(text)
+
+    def _finished(self, text, blocks):
+        self.in_flight = False
+        self.rendered.emit(text, blocks)
+        self._schedule()
+
+    def stop(self):
+        self.timer.stop()
+        self.pending = None
+        self.thread.quit()
+        self.thread.wait()
+
+class DocumentLoadWorker(QObject):
+    loaded = Signal(object, object)  # note, QTextDocument
+    done = Signal()
+
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+        self.gui_thread = QCoreApplication.instance().thread()
+
+    @Slot(object)
+    def load(self, note_ids):
+        for note_id in note_ids:
+            note = self.db.get_note(note_id)
+            if note is None:
+                continue
+            document = make_document(note.content)
+            # Handed over to the editor, which lives on the GUI thread
+            document.moveToThread(self.gui_thread)
+            self.loaded.emit(note, document)
+        self.done.emit()
+
+class DocumentPrefetcher(QObject):
+    """Loads notes and builds their editor documents on a background thread.
+
+    At most one batch is in flight. A batch requested in the meantime
+    replaces any batch still waiting, so after a burst of clicks only the
+    neighbours of the latest note are loaded.
+    """
+    loaded = Signal(object, object)  # note, QTextDocument
+    _load_requested = Signal(object)
+
+    def __init__(self, db, parent=None):
+        super().__init__(parent)
+        self.pending = None
+        self.in_flight = False
+
+        self.thread = QThread()
+        self.worker = DocumentLoadWorker(db)
+        self.worker.moveToThread(self.thread)
+        self._load_requested.connect(self.worker.load)
+        self.worker.loaded.connect(self.loaded)
+        self.worker.done.connect(self._finished)
+        self.thread.start()
+
+    def prefetch(self, note_ids):
+        self.pending = list(note_ids)
+        self._dispatch()
+
+    def _dispatch(self):
+        if self.in_flight or not self.pending:
+            return
+        note_ids, self.pending = self.pending, None
+        self.in_flight = True
+        self._load_requested.emit(note_ids)
+
+    def _finished(self):
+        self.in_flight = False
+        self._dispatch()
+
+    def stop(self):
+        self.pending = None
+        self.thread.quit()
+        self.thread.wait()